@@ -0,0 +1,162 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+import argparse
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# Third-party
+import brotli
+
+# Add 'src/' to sys.path to allow imports of the programme modules
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src/"))
+)
+
+# Custom
+import utils
+from utils import TransferStats, get_http_response
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# Encodings compared, as sent in Accept-Encoding
+ENCODINGS = ("identity", "gzip", "br")
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+def make_payload(number_articles:int) -> bytes:
+    """Build a News API /v2/everything style JSON body
+
+    Args:
+        number_articles (int): number of articles in the body
+
+    Returns:
+        bytes: JSON body
+    """
+    articles = [
+        {
+            "source": {"id": None, "name": f"Source {i % 17}"},
+            "author": f"Author {i % 31}",
+            "title": f"Article {i} about electric vehicles and the markets",
+            "description": f"Description {i} of the latest developments reported today.",
+            "url": f"https://news.example.com/articles/{i}",
+            "urlToImage": f"https://news.example.com/images/{i}.jpg",
+            "publishedAt": f"2025-02-07T{i % 24:02d}:{i % 60:02d}:00Z",
+            "content": f"Content {i} of the article, truncated by the API... [+{1000 + i} chars]",
+        }
+        for i in range(number_articles)
+    ]
+    return json.dumps({"status": "ok", "totalResults": number_articles, "articles": articles}).encode()
+
+
+def start_stub_server(payload:bytes, bandwidth:float=None) -> ThreadingHTTPServer:
+    """Serve the payload on localhost in the encoding the client accepts
+
+    Bodies are compressed once up front so the server does not add CPU time
+    to the measurements.
+
+    Args:
+        payload (bytes): uncompressed JSON body
+        bandwidth (float, optional): bytes per second to throttle the body to,
+            to model a network link. Defaults to no throttling.
+
+    Returns:
+        ThreadingHTTPServer: running server, call shutdown() when done
+    """
+    bodies = {
+        "identity": payload,
+        "gzip": gzip.compress(payload),
+        "br": brotli.compress(payload),
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            accepted = [e.strip() for e in self.headers.get("Accept-Encoding", "").split(",")]
+            encoding = next((e for e in ("br", "gzip") if e in accepted), "identity")
+            body = bodies[encoding]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if encoding != "identity":
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+            chunk = 16384
+            for start in range(0, len(body), chunk):
+                self.wfile.write(body[start:start + chunk])
+                if bandwidth:
+                    time.sleep(min(chunk, len(body) - start) / bandwidth)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark(url:str, encoding:str, repeats:int) -> dict:
+    """Fetch the stub repeatedly with one Accept-Encoding
+
+    Args:
+        url (str): URL of the stub server
+        encoding (str): value of Accept-Encoding
+        repeats (int): number of fetches
+
+    Returns:
+        dict: mean wall and CPU seconds per fetch and bytes per fetch
+    """
+    stats = TransferStats()
+    headers = {"User-Agent": "benchmark", "Accept-Encoding": encoding}
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(repeats):
+        get_http_response(url, headers=headers, stats=stats)
+    return {
+        "encoding": encoding,
+        "wall_ms": (time.perf_counter() - wall) / repeats * 1000,
+        "cpu_ms": (time.process_time() - cpu) / repeats * 1000,
+        "compressed_bytes": stats.compressed_bytes // repeats,
+        "decompressed_bytes": stats.decompressed_bytes // repeats,
+    }
+
+# =============================================================================
+# Programme exectuion
+# =============================================================================
+
+if __name__ == "__main__":
+
+    # Parsed values
+    parser = argparse.ArgumentParser(description="compare transfer time and CPU of NewsAPI payload encodings against a local stub server")
+    parser.add_argument("-n", "--number_articles", type=int, default=100, help="articles in the stub payload")
+    parser.add_argument("-r", "--repeats", type=int, default=50, help="fetches per encoding")
+    parser.add_argument("-b", "--bandwidth", type=float, required=False, help="bytes per second to throttle the stub to")
+    args = parser.parse_args()
+
+    # Keep the response dumps of get_http_response and urllib3 out of the measurements
+    utils.logger.setLevel(logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = start_stub_server(make_payload(args.number_articles), bandwidth=args.bandwidth)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v2/everything"
+    try:
+        print(f"{'encoding':<10}{'wall ms':>10}{'cpu ms':>10}{'received':>12}{'decoded':>12}")
+        for encoding in ENCODINGS:
+            result = benchmark(url, encoding, args.repeats)
+            print(
+                f"{result['encoding']:<10}{result['wall_ms']:>10.2f}{result['cpu_ms']:>10.2f}"
+                f"{result['compressed_bytes']:>12}{result['decompressed_bytes']:>12}"
+            )
+    finally:
+        server.shutdown()
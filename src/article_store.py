@@ -0,0 +1,324 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+from datetime import date
+import sqlite3
+import time
+from typing import Iterable
+
+# Custom
+from custom_logger import get_custom_logger
+from utils import Article
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# Logging
+logger = get_custom_logger("data/configurations/logger.yaml")
+
+# Schema of the local article store, articles are deduplicated by URL and
+# indexed for full-text search on their title and description, topics record
+# when each was last fetched from the News API and sender_quota how many
+# emails each sender account sent on each day
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT,
+    description TEXT,
+    published_at TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_fetched_at ON articles (fetched_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, description, content='articles', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts (rowid, title, description)
+    VALUES (new.id, new.title, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+END;
+CREATE TABLE IF NOT EXISTS topics (
+    topic TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sender_quota (
+    username TEXT NOT NULL,
+    day TEXT NOT NULL,
+    sent INTEGER NOT NULL,
+    PRIMARY KEY (username, day)
+);
+"""
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+def build_match_query(topic:str) -> str:
+    """Build an FTS5 MATCH expression requiring every term of the topic
+
+    Args:
+        topic (str): topic of news, e.g. "tesla" or "climate change"
+
+    Raises:
+        ValueError: topic contains no search terms
+
+    Returns:
+        str: FTS5 query with each term quoted so no term is read as syntax
+    """
+    terms = topic.split()
+    if not terms:
+        raise ValueError("Topic must contain at least one search term")
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def normalize_topic(topic:str) -> str:
+    """Normalize a topic so differently spaced or cased queries share a record
+
+    Args:
+        topic (str): topic of news
+
+    Returns:
+        str: lower case terms of the topic separated by single spaces
+    """
+    return " ".join(topic.lower().split())
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+class ArticleStore:
+    """Local SQLite store of fetched articles with an FTS5 full-text index
+
+    Every article fetched from the News API is ingested once, deduplicated by
+    URL, so that topic digests can be answered from the store while its data
+    is fresh and the API is only queried on a miss.
+    """
+
+    def __init__(self, path:str):
+        """Open, creating if needed, the article store at the given path
+
+        Args:
+            path (str): path of the SQLite database file, or ":memory:"
+
+        Raises:
+            sqlite3.Error: the database could not be opened or initialised
+        """
+        logger.info(f"Opening article store {path}...")
+        try:
+            self.path = path
+            self.connection = sqlite3.connect(path)
+            self.connection.executescript(SCHEMA)
+            logger.info(f"Opened article store {path}")
+
+        except sqlite3.Error as se:
+            logger.critical(f"SQLite error: could not open article store {path}: {se}")
+            raise
+
+    def close(self):
+        """Close the connection to the article store"""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def count(self) -> int:
+        """Number of articles in the store"""
+        return self.connection.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def ingest(self, articles:Iterable[Article], fetched_at:float=None, topic:str=None) -> int:
+        """Insert articles in a single transaction, refreshing known URLs
+
+        Articles already in the store keep their content and index entry,
+        only their fetch time is updated.
+
+        Args:
+            articles (Iterable[Article]): validated articles to store
+            fetched_at (float, optional): epoch seconds the articles were
+                fetched at. Defaults to now.
+            topic (str, optional): topic the articles were fetched for, recorded
+                as fetched at fetched_at. Defaults to None.
+
+        Raises:
+            sqlite3.Error: the transaction failed and was rolled back
+
+        Returns:
+            int: number of articles that were new to the store
+        """
+        if fetched_at is None:
+            fetched_at = time.time()
+        rows = (
+            (article.url, article.title, article.description, article.published_at, fetched_at)
+            for article in articles
+        )
+
+        logger.info("Ingesting articles into article store...")
+        try:
+            with self.connection:
+                before = self.count()
+                # Known URLs are refreshed so a re-fetched topic is fresh again
+                self.connection.executemany(
+                    "INSERT INTO articles "
+                    "(url, title, description, published_at, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(url) DO UPDATE SET fetched_at = excluded.fetched_at",
+                    rows,
+                )
+                inserted = self.count() - before
+                if topic is not None:
+                    self.connection.execute(
+                        "INSERT INTO topics (topic, fetched_at) VALUES (?, ?) "
+                        "ON CONFLICT(topic) DO UPDATE SET fetched_at = excluded.fetched_at",
+                        (normalize_topic(topic), fetched_at),
+                    )
+            logger.info(f"Ingested {inserted} new articles into article store")
+            return inserted
+
+        except sqlite3.Error as se:
+            logger.error(f"SQLite error: could not ingest articles: {se}")
+            raise
+
+    def search(self, topic:str, number_articles:int=20, max_age:float=None) -> list:
+        """Full-text search the store for the most recent articles on a topic
+
+        Args:
+            topic (str): topic of news to search for
+            number_articles (int, optional): maximum number of articles to
+                return. Defaults to 20.
+            max_age (float, optional): only consider articles fetched within
+                this many seconds. Defaults to no limit.
+
+        Raises:
+            ValueError: topic contains no search terms
+            sqlite3.Error: the query failed
+
+        Returns:
+            list: matching articles, newest first
+        """
+        query = build_match_query(topic)
+        oldest = 0.0 if max_age is None else time.time() - max_age
+
+        try:
+            cursor = self.connection.execute(
+                "SELECT a.title, a.description, a.url, a.published_at FROM articles_fts "
+                "JOIN articles AS a ON a.id = articles_fts.rowid "
+                "WHERE articles_fts MATCH ? AND a.fetched_at >= ? "
+                "ORDER BY a.published_at DESC, a.id DESC LIMIT ?",
+                (query, oldest, number_articles),
+            )
+            articles = [Article(*row) for row in cursor]
+            logger.debug(f"Article store matched {len(articles)} articles for {topic}")
+            return articles
+
+        except sqlite3.Error as se:
+            logger.error(f"SQLite error: could not search article store: {se}")
+            raise
+
+    def get_topic_fetched_at(self, topic:str):
+        """Epoch seconds the topic was last fetched at, None if never"""
+        row = self.connection.execute(
+            "SELECT fetched_at FROM topics WHERE topic = ?", (normalize_topic(topic),)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def get_fresh_articles(self, topic:str, number_articles:int=20, max_age:float=3600):
+        """Answer a topic digest from the store if it holds enough fresh data
+
+        A topic fetched within max_age is a hit even with fewer matches than
+        number_articles, as the News API had no more to give. Other topics hit
+        when enough fresh articles fetched for overlapping topics match.
+
+        Args:
+            topic (str): topic of news to search for
+            number_articles (int, optional): number of articles the digest
+                needs. Defaults to 20.
+            max_age (float, optional): seconds after which stored articles are
+                stale. Defaults to 3600.
+
+        Returns:
+            list | None: the articles on a hit, None on a miss so the caller
+                falls back to the News API
+        """
+        articles = self.search(topic, number_articles=number_articles, max_age=max_age)
+        fetched_at = self.get_topic_fetched_at(topic)
+        recently_fetched = fetched_at is not None and fetched_at >= time.time() - max_age
+        if len(articles) < number_articles and not recently_fetched:
+            logger.info(f"Article store miss for topic {topic}")
+            return None
+        logger.info(f"Article store hit for topic {topic}")
+        return articles
+
+    def get_sent_count(self, username:str, day:date) -> int:
+        """Number of emails a sender account sent on a day, 0 if none were recorded
+
+        Args:
+            username (str): Gmail address of the sender account
+            day (date): day of sending
+
+        Returns:
+            int: emails sent by the account on the day
+        """
+        row = self.connection.execute(
+            "SELECT sent FROM sender_quota WHERE username = ? AND day = ?",
+            (username, day.isoformat()),
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def record_sent_count(self, username:str, day:date, sent:int):
+        """Record the number of emails a sender account sent on a day
+
+        Args:
+            username (str): Gmail address of the sender account
+            day (date): day of sending
+            sent (int): emails sent by the account on the day so far
+
+        Raises:
+            sqlite3.Error: the transaction failed and was rolled back
+        """
+        try:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT INTO sender_quota (username, day, sent) VALUES (?, ?, ?) "
+                    "ON CONFLICT(username, day) DO UPDATE SET sent = excluded.sent",
+                    (username, day.isoformat(), sent),
+                )
+                # Counts of earlier days are never read again
+                self.connection.execute("DELETE FROM sender_quota WHERE day < ?", (day.isoformat(),))
+
+        except sqlite3.Error as se:
+            logger.error(f"SQLite error: could not record sent count of {username}: {se}")
+            raise
+
+    def purge(self, max_age:float) -> int:
+        """Delete articles fetched more than max_age seconds ago
+
+        Args:
+            max_age (float): retention period of articles in seconds
+
+        Raises:
+            sqlite3.Error: the transaction failed and was rolled back
+
+        Returns:
+            int: number of articles deleted
+        """
+        logger.info("Purging stale articles from article store...")
+        try:
+            with self.connection:
+                oldest = time.time() - max_age
+                cursor = self.connection.execute("DELETE FROM articles WHERE fetched_at < ?", (oldest,))
+                self.connection.execute("DELETE FROM topics WHERE fetched_at < ?", (oldest,))
+            logger.info(f"Purged {cursor.rowcount} stale articles from article store")
+            return cursor.rowcount
+
+        except sqlite3.Error as se:
+            logger.error(f"SQLite error: could not purge article store: {se}")
+            raise
@@ -3,8 +3,14 @@
 # =============================================================================
 
 # Python modules
+import gzip
 import logging
 import logging.config
+import logging.handlers
+import os
+import shutil
+import threading
+import time
 
 # Third-party modules
 import yaml
@@ -84,4 +90,179 @@ def get_custom_logger(yaml_config_file_path: str):
         )
         raise RuntimeError(
             f"RuntimeError: unexpected error occurred in custom_logger: {e}"
-        ) from e
\ No newline at end of file
+        ) from e
+
+
+def gzip_namer(name:str) -> str:
+    """Name rotated log files with a .gz suffix
+
+    Args:
+        name (str): default name of the rotated log file
+
+    Returns:
+        str: name of the compressed rotated log file
+    """
+    return f"{name}.gz"
+
+
+def gzip_rotator(source:str, dest:str):
+    """Compress a rotated log file and remove the uncompressed original
+
+    Args:
+        source (str): path of the log file being rotated
+        dest (str): path of the compressed rotated log file
+    """
+    with open(source, "rb") as file_in, gzip.open(dest, "wb") as file_out:
+        shutil.copyfileobj(file_in, file_out)
+    os.remove(source)
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Size-based rotating file handler that gzips rotated log files"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namer = gzip_namer
+        self.rotator = gzip_rotator
+
+
+class CompressedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Time-based rotating file handler that gzips rotated log files"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namer = gzip_namer
+        self.rotator = gzip_rotator
+
+
+class BufferedHandler(logging.handlers.MemoryHandler):
+    """Memory handler writing records to its target in batches
+
+    Records are flushed to the target once capacity records are buffered, a
+    record at flushLevel or above arrives, or flushInterval seconds have
+    passed since the last flush, whichever comes first. A background timer
+    flushes records left waiting when no further record arrives, e.g. while
+    the scheduler sleeps between slots.
+
+    A batch for a stream or file target is formatted into one string and
+    written with a single write, flush and rollover check.
+    """
+
+    def __init__(self, capacity:int=256, flushLevel:int=logging.ERROR, target:logging.Handler=None, flushOnClose:bool=True, flushInterval:float=5.0):
+        """Create the handler
+
+        Args:
+            capacity (int, optional): records buffered before a flush. Defaults to 256.
+            flushLevel (int, optional): level of records flushed at once. Defaults to logging.ERROR.
+            target (logging.Handler, optional): handler the records are written to. Defaults to None.
+            flushOnClose (bool, optional): flush the buffer when closed. Defaults to True.
+            flushInterval (float, optional): seconds records may wait in the
+                buffer, no timer runs if not positive. Defaults to 5.0.
+        """
+        # Level names from YAML configuration are not converted by dictConfig
+        if isinstance(flushLevel, str):
+            flushLevel = logging.getLevelName(flushLevel)
+        super().__init__(capacity, flushLevel=flushLevel, target=target, flushOnClose=flushOnClose)
+        self.flushInterval = flushInterval
+        self.lastFlush = time.monotonic()
+        self._closed = threading.Event()
+        if flushInterval and flushInterval > 0:
+            threading.Thread(target=self._flush_periodically, name="BufferedHandler", daemon=True).start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flushInterval):
+            if self.buffer and time.monotonic() - self.lastFlush >= self.flushInterval:
+                self.flush()
+
+    def shouldFlush(self, record:logging.LogRecord) -> bool:
+        return (
+            super().shouldFlush(record)
+            or time.monotonic() - self.lastFlush >= self.flushInterval
+        )
+
+    def flush(self):
+        with self.lock:
+            if self.target is not None and self.buffer:
+                records, self.buffer = self.buffer, []
+                if isinstance(self.target, logging.StreamHandler):
+                    self._write_batch(records)
+                else:
+                    for record in records:
+                        self.target.handle(record)
+            self.lastFlush = time.monotonic()
+
+    def _write_batch(self, records:list):
+        """Write records to a stream or file target as a single write
+
+        Args:
+            records (list): buffered records, filtered by the target's level and filters
+        """
+        target = self.target
+        records = [record for record in records if record.levelno >= target.level and target.filter(record)]
+        if not records:
+            return
+        with target.lock:
+            try:
+                text = "".join(target.format(record) + target.terminator for record in records)
+                if isinstance(target, logging.FileHandler) and target.stream is None:
+                    target.stream = target._open()
+                if isinstance(target, logging.handlers.RotatingFileHandler):
+                    position = target.stream.tell()
+                    if target.maxBytes > 0 and position > 0 and position + len(text) >= target.maxBytes:
+                        target.doRollover()
+                elif isinstance(target, logging.handlers.BaseRotatingHandler) and target.shouldRollover(records[-1]):
+                    target.doRollover()
+                # Rollover of a delayed file handler leaves the stream closed
+                if isinstance(target, logging.FileHandler) and target.stream is None:
+                    target.stream = target._open()
+                target.stream.write(text)
+                target.flush()
+            except Exception:
+                target.handleError(records[-1])
+
+    def close(self):
+        self._closed.set()
+        super().close()
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket capping the bytes of log messages a logger emits per second
+
+    Records at or above ERROR are never dropped. The number of dropped records
+    is appended to the next record let through.
+    """
+
+    def __init__(self, rate:float=65536, burst:float=None, name:str=""):
+        """Create the filter
+
+        Args:
+            rate (float, optional): bytes of messages allowed per second. Defaults to 65536.
+            burst (float, optional): bytes allowed at once. Defaults to 4 seconds of rate.
+            name (str, optional): name of the logger the filter applies to. Defaults to "".
+        """
+        super().__init__(name)
+        self.rate = rate
+        self.burst = burst if burst is not None else 4 * rate
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record:logging.LogRecord) -> bool:
+        size = len(record.getMessage())
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if record.levelno < logging.ERROR and size > self.tokens:
+                self.dropped += 1
+                return False
+            self.tokens -= size
+            if self.dropped:
+                record.msg = f"{record.getMessage()} ({self.dropped} log records dropped by rate limit)"
+                record.args = None
+                self.dropped = 0
+        return True
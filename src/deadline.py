@@ -0,0 +1,198 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+from contextlib import contextmanager
+import os
+import socket
+import threading
+import time
+from typing import Callable
+
+# Custom
+from custom_logger import get_custom_logger
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# Logging
+logger = get_custom_logger("data/configurations/logger.yaml")
+
+# Exit status of a run cut short by its deadline
+EXIT_DEADLINE_EXCEEDED = 3
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+@contextmanager
+def shutdown_on_expiry(connection, deadline:"Deadline"):
+    """Shut a connection down if the deadline passes while in the block
+
+    Socket timeouts apply to each read or write, so a peer answering a little
+    at a time can outlast any deadline. Shutting the connection down makes
+    every blocked or later read and write on it fail at once.
+
+    Args:
+        connection: socket or file object of the connection, with fileno()
+        deadline (Deadline): deadline of the work, None for no limit
+
+    Yields:
+        None
+    """
+    remaining = None if deadline is None else deadline.remaining()
+    sock = None
+    if remaining is not None:
+        try:
+            # Own handle on the socket so the timer never touches a reused descriptor
+            sock = socket.socket(fileno=os.dup(connection.fileno()))
+        except (AttributeError, OSError, TypeError, ValueError):
+            sock = None
+    if sock is None:
+        yield
+        return
+
+    lock = threading.Lock()
+
+    def shutdown():
+        with lock:
+            if sock.fileno() != -1:
+                logger.debug("Deadline passed, shutting connection down")
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    timer = threading.Timer(remaining, shutdown)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    finally:
+        timer.cancel()
+        with lock:
+            sock.close()
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work is attempted after its deadline has passed"""
+
+
+class Deadline:
+    """Point in time by which work must finish, or no limit if seconds is None"""
+
+    def __init__(self, seconds:float=None, clock:Callable=time.monotonic):
+        """Start a deadline
+
+        Args:
+            seconds (float, optional): seconds from now until the deadline. Defaults to no limit.
+            clock (Callable, optional): monotonic clock in seconds. Defaults to time.monotonic.
+        """
+        self.seconds = seconds
+        self.clock = clock
+        self.start = clock()
+        self.end = None if seconds is None else self.start + seconds
+
+    def remaining(self):
+        """Seconds left until the deadline
+
+        Returns:
+            float | None: seconds left, never negative, None if there is no limit
+        """
+        if self.end is None:
+            return None
+        return max(self.end - self.clock(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        """bool: True once the deadline has passed"""
+        return self.end is not None and self.clock() >= self.end
+
+    def elapsed(self) -> float:
+        """Seconds since the deadline was started"""
+        return self.clock() - self.start
+
+    def timeout(self, default:float=None):
+        """Timeout to pass to a blocking network call
+
+        Args:
+            default (float, optional): timeout to use, capped by the deadline. Defaults to None.
+
+        Raises:
+            DeadlineExceeded: the deadline has already passed
+
+        Returns:
+            float | None: seconds the call may block for, None for no limit
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline exceeded before the call was made")
+        return remaining if default is None else min(remaining, default)
+
+
+class RunBudget:
+    """Whole-run deadline split into sub-budgets for each stage of the run
+
+    Each stage gets its share of the time left when it starts, relative to the
+    shares of the stages not yet run, so time saved by a fast stage rolls over
+    to the later ones. A stage without a share gets all the time left.
+    """
+
+    def __init__(self, seconds:float=None, shares:dict=None, clock:Callable=time.monotonic):
+        """Start the run budget
+
+        Args:
+            seconds (float, optional): seconds for the whole run. Defaults to no limit.
+            shares (dict, optional): relative share of the budget of each stage, in run order. Defaults to None.
+            clock (Callable, optional): monotonic clock in seconds. Defaults to time.monotonic.
+        """
+        self.deadline = Deadline(seconds, clock=clock)
+        self.shares = dict(shares or {})
+        self.clock = clock
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name:str):
+        """Run a stage within its sub-budget
+
+        Args:
+            name (str): name of the stage, a stage missing from shares gets
+                the whole remaining budget
+
+        Yields:
+            Deadline: deadline of the stage, never later than the run deadline
+        """
+        remaining = self.deadline.remaining()
+        if remaining is None or name not in self.shares:
+            seconds = remaining
+        else:
+            pending = sum(share for stage, share in self.shares.items() if stage not in self.timings)
+            seconds = remaining * self.shares[name] / pending if pending else remaining
+        deadline = Deadline(seconds, clock=self.clock)
+        logger.debug(f"Stage {name} budget: {seconds} seconds")
+        try:
+            yield deadline
+        finally:
+            self.timings[name] = (seconds, deadline.elapsed())
+
+    def report(self) -> str:
+        """Timing report of the stages run so far
+
+        Returns:
+            str: elapsed and budgeted seconds of each stage and the whole run
+        """
+        lines = [
+            f"{name}: {elapsed:.2f}s" + ("" if budget is None else f" of {budget:.2f}s")
+            for name, (budget, elapsed) in self.timings.items()
+        ]
+        total = f"total: {self.deadline.elapsed():.2f}s"
+        if self.deadline.seconds is not None:
+            total += f" of {self.deadline.seconds:.2f}s"
+        return ", ".join(lines + [total])
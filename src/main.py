@@ -4,11 +4,22 @@
 
 # Python
 import argparse
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+import sys
+
+# Third-party
+import requests
 
 # Custom
+from article_store import ArticleStore
 from custom_logger import get_custom_logger
-from send_email import format_gmail_message, send_gmail_from_ppw
-from utils import get_env_var, get_news_api_endpoint, get_http_response, get_article_title_description_link
+from deadline import EXIT_DEADLINE_EXCEEDED, Deadline, DeadlineExceeded, RunBudget
+from offline_output import OUTPUT_FORMATS, open_writer, write_messages
+from render_cache import RenderCache
+from scheduler import assign_slots, load_recipients, run_schedule
+from send_email import SenderPool, format_gmail_message, parse_sender_accounts, send_gmail_from_ppw
+from utils import TransferStats, get_env_var, get_news_api_endpoint, get_http_response, iter_articles, render_articles
 
 # =============================================================================
 # Variables
@@ -21,47 +32,251 @@ logger = get_custom_logger("data/configurations/logger.yaml")
 SUBJECT = "Daily news email"
 BASE_MESSAGE = "To whom it may concern,\n\n Please find below the titles and descriptions of articles from the news that are of interest to you:\n\n"
 
+# Sender of emails written with --output when no Gmail account is set
+OFFLINE_SENDER = "daily-news@example.com"
+
+# Share of the --deadline budget of each stage of a run
+STAGE_SHARES = {"fetch": 0.5, "render": 0.1, "send": 0.4}
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+def get_topic_articles(topic:str="tesla", number_articles:int=20, endpoint:str=None, store:ArticleStore=None, max_age:float=3600, deadline:Deadline=None, stats:TransferStats=None) -> list:
+    """Get the articles of a topic from the local store, or News API on a miss
+
+    Args:
+        topic (str, optional): topic of news. Defaults to "tesla".
+        number_articles (int, optional): number of articles needed. Defaults to 20.
+        endpoint (str, optional): endpoint overriding the topic, never served from the store. Defaults to None.
+        store (ArticleStore, optional): local article store. Defaults to None.
+        max_age (float, optional): seconds for which stored articles are fresh. Defaults to 3600.
+        deadline (Deadline, optional): deadline of the fetch, on expiry stale
+            stored articles are served when there are any. Defaults to None.
+        stats (TransferStats, optional): records the bytes of the fetch. Defaults to None.
+
+    Raises:
+        DeadlineExceeded: the deadline passed and the store cannot answer
+        requests.exceptions.Timeout: News API timed out and the store cannot answer
+
+    Returns:
+        list: the first number_articles Article records
+    """
+    # Local store can only answer topic queries, not arbitrary endpoints
+    use_store = store is not None and endpoint is None
+    if use_store:
+        articles = store.get_fresh_articles(topic=topic, number_articles=number_articles, max_age=max_age)
+        if articles is not None:
+            return articles
+
+    if endpoint is None:
+        endpoint = get_news_api_endpoint(api_key=get_env_var("NEWS_API_KEY"), topic=topic)
+
+    # Lazily fetch -> validate, only the Article fields needed are kept, on a
+    # store miss every article is ingested for later runs
+    try:
+        content = get_http_response(url=endpoint, stats=stats, deadline=deadline)
+    except (DeadlineExceeded, requests.exceptions.Timeout):
+        if not use_store:
+            raise
+        # Out of time, a partial digest of stale articles beats no digest
+        logger.warning(f"Out of time fetching {topic}, serving stale articles from store")
+        return store.search(topic=topic, number_articles=number_articles)
+    articles = iter_articles(content)
+    if store is None:
+        return list(islice(articles, number_articles))
+    articles = list(articles)
+    store.ingest(articles, topic=topic)
+    return articles[:number_articles]
+
+
+def build_message(sender:str, receiver:str, articles:list, number_articles:int=20, cache:RenderCache=None):
+    """Render articles into a news email
+
+    Args:
+        sender (str): Gmail address of sender
+        receiver (str): Gmail address of receiver
+        articles (list): Article records to render
+        number_articles (int, optional): number of articles to render. Defaults to 20.
+        cache (RenderCache, optional): cache sharing the encoded body between
+            recipients of the same digest. Defaults to None.
+
+    Returns:
+        EmailMessage | None: the email, None if there are no articles to send
+    """
+    selected = list(islice(articles, number_articles))
+    if not selected:
+        return None
+    if cache is not None:
+        return cache.format_message(SUBJECT, sender, receiver, BASE_MESSAGE, selected)
+    raw_message = BASE_MESSAGE + "\n\n".join(render_articles(selected, number_articles))
+    return format_gmail_message(subject=SUBJECT, sender=sender, receiver=receiver, message=raw_message)
+
+
+def send_messages(messages:list, username:str, password:str, pool:SenderPool=None, deadline:Deadline=None, writer=None) -> list:
+    """Send emails from the sender pool, or the single Gmail account, or write them offline
+
+    Args:
+        messages (list): EmailMessage objects to send
+        username (str): Gmail address of sender when there is no pool
+        password (str): password of sender Gmail address when there is no pool
+        pool (SenderPool, optional): pool of sender accounts. Defaults to None.
+        deadline (Deadline, optional): deadline after which sending stops. Defaults to None.
+        writer (optional): offline writer from open_writer used instead of SMTP. Defaults to None.
+
+    Raises:
+        OSError: a connection or SMTP error unrelated to the deadline
+
+    Returns:
+        list: messages that could not be sent
+    """
+    if writer is not None:
+        write_messages(messages, writer)
+        return []
+    if pool is not None:
+        return pool.send(messages, deadline=deadline)
+    for i, message in enumerate(messages):
+        try:
+            send_gmail_from_ppw(username=username, password=password, message=message, deadline=deadline)
+        except OSError as eos:
+            # smtplib turns a read timing out into SMTPServerDisconnected, so
+            # any connection error once the deadline passed is a timeout
+            if not isinstance(eos, TimeoutError) and not (deadline is not None and deadline.expired):
+                raise
+            logger.error(f"Out of time sending emails, {len(messages) - i} not sent: {eos}")
+            return messages[i:]
+    return []
+
 # =============================================================================
 # Programme exectuion
 # =============================================================================
 
 if __name__ == "__main__":
-    
+
     # Parsed values
     parser = argparse.ArgumentParser(description="endpoint from which to request API data")
     parser.add_argument("-e", "--endpoint", type=str, required=False, help="endpoint URL address")
     parser.add_argument("-t", "--topic", type=str, required=False, help="topic of news to be sent")
     parser.add_argument("-n", "--number_articles", type=int, required=False, help="number of articles to be emailed")
+    parser.add_argument("-s", "--store", type=str, required=False, help="path of local article store to serve topics from")
+    parser.add_argument("--max_age", type=float, default=3600, help="seconds for which articles in the store are fresh")
+    parser.add_argument("--retention", type=float, default=7 * 24 * 3600, help="seconds for which articles are kept in the store")
+    parser.add_argument("--daily_quota", type=int, default=500, help="emails each account in GMAIL_ACCOUNTS may send per day")
+    parser.add_argument("--max_sessions", type=int, default=2, help="concurrent SMTP sessions per account in GMAIL_ACCOUNTS")
+    parser.add_argument("-r", "--recipients", type=str, required=False, help="YAML file of recipients to schedule over the day")
+    parser.add_argument("--window_minutes", type=int, default=60, help="minutes over which recipients of the same hour are spread")
+    parser.add_argument("--slot_minutes", type=int, default=5, help="minutes between delivery slots")
+    parser.add_argument("--max_per_slot", type=int, default=50, help="most recipients delivered in a slot")
+    parser.add_argument("--lead_minutes", type=float, default=5, help="minutes before a slot its topics are fetched")
+    parser.add_argument("-d", "--deadline", type=float, required=False, help="seconds the whole run may take")
+    parser.add_argument("-o", "--output", type=str, required=False, help="write emails to this path instead of sending them")
+    parser.add_argument("--output_format", type=str, choices=OUTPUT_FORMATS, default="eml", help="format of --output")
     args = parser.parse_args()
     endpoint = args.endpoint
-    topic = args.topic
-    number_articles = args.number_articles
-    
+    topic = args.topic if args.topic is not None else "tesla"
+    number_articles = args.number_articles if args.number_articles is not None else 20
+    store = ArticleStore(args.store) if args.store is not None else None
+
     # Get ENV vars
     username = get_env_var("GMAIL_USERNAME")
     password = get_env_var("GMAIL_PASSWORD")
-    
-    # If no URL or topic parsed
-    if endpoint is None:
-        api_key = get_env_var("NEWS_API_KEY")
-        if topic is not None:
-            endpoint = get_news_api_endpoint(api_key=api_key, topic=topic)
+    accounts = get_env_var("GMAIL_ACCOUNTS")
+    pool = None
+    if accounts:
+        pool = SenderPool(parse_sender_accounts(accounts, daily_quota=args.daily_quota, max_sessions=args.max_sessions))
+        if store is not None:
+            # Carry over what earlier runs today already sent
+            for account in pool.accounts:
+                account.sent_today = store.get_sent_count(account.username, account.day)
+        if username is None:
+            username = pool.accounts[0].username
+
+    writer = None
+    if args.output is not None:
+        writer = open_writer(args.output, args.output_format)
+        if username is None:
+            # Offline output needs no Gmail account
+            username = OFFLINE_SENDER
+
+    budget = RunBudget(args.deadline, shares=STAGE_SHARES)
+    transfer_stats = TransferStats()
+    timed_out = False
+
+    # The writer and store are released however the run ends, a stale mbox
+    # lock would block every later run
+    try:
+        if args.recipients is not None:
+            # Spread delivery over each recipient's preferred hour
+            slots = assign_slots(
+                load_recipients(args.recipients),
+                now=datetime.now(timezone.utc),
+                window_minutes=args.window_minutes,
+                slot_minutes=args.slot_minutes,
+                max_per_slot=args.max_per_slot,
+            )
+
+            cache = RenderCache()
+            with budget.stage("schedule") as deadline:
+
+                def fetch(slot_topic):
+                    try:
+                        return get_topic_articles(topic=slot_topic, number_articles=number_articles, store=store, max_age=args.max_age, deadline=deadline, stats=transfer_stats)
+                    except (DeadlineExceeded, requests.exceptions.Timeout) as te:
+                        logger.error(f"Out of time fetching {slot_topic}: {te}")
+                        return []
+
+                def send(slot, articles):
+                    messages = [
+                        build_message(username, recipient.email, articles[recipient.topic], number_articles, cache=cache)
+                        for recipient in slot.recipients
+                    ]
+                    failed = send_messages([m for m in messages if m is not None], username, password, pool, deadline=deadline, writer=writer)
+                    if failed:
+                        logger.error(f"Could not send {len(failed)} emails of slot {slot.start.isoformat()}")
+
+                try:
+                    run_schedule(slots, fetch, send, lead=timedelta(minutes=args.lead_minutes), deadline=deadline)
+                except DeadlineExceeded as de:
+                    logger.error(f"Schedule cut short: {de}")
+                timed_out = deadline.expired
+            logger.info(f"Rendered {cache.misses} distinct digests for {cache.hits + cache.misses} emails")
         else:
-            endpoint = get_news_api_endpoint(api_key=api_key)
-
-    # Get content of HTTP response
-    content = get_http_response(url=endpoint)
-    # If no number_articles parsed
-    if number_articles is not None:
-        raw_message = f"{BASE_MESSAGE}{get_article_title_description_link(content=content, number_articles=number_articles)}"
-    else:
-        raw_message = f"{BASE_MESSAGE}{get_article_title_description_link(content=content)}"
-    
-    # Email
-    if raw_message != BASE_MESSAGE:
-        logger.info(f"Sending news articles email...")
-        message = format_gmail_message(subject=SUBJECT, sender=username, receiver=username,message=raw_message )
-        send_gmail_from_ppw(username=username, password=password, message=message)
-        logger.info(f"Sent news articles email")
-    else:
-        logger.info(f"No news articles to send in email")
\ No newline at end of file
+            with budget.stage("fetch") as deadline:
+                try:
+                    articles = get_topic_articles(topic=topic, number_articles=number_articles, endpoint=endpoint, store=store, max_age=args.max_age, deadline=deadline, stats=transfer_stats)
+                except (DeadlineExceeded, requests.exceptions.Timeout) as te:
+                    logger.error(f"Out of time fetching news articles: {te}")
+                    articles = []
+                timed_out = deadline.expired
+
+            with budget.stage("render"):
+                message = build_message(username, username, articles, number_articles)
+
+            # Email
+            with budget.stage("send") as deadline:
+                if message is not None:
+                    logger.info(f"Sending news articles email...")
+                    if send_messages([message], username, password, pool, deadline=deadline, writer=writer):
+                        if not deadline.expired:
+                            raise RuntimeError("RuntimeError: no sender account could send the news articles email")
+                        timed_out = True
+                    else:
+                        logger.info(f"Sent news articles email")
+                else:
+                    logger.info(f"No news articles to send in email")
+    finally:
+        if writer is not None:
+            writer.close()
+        if store is not None:
+            if pool is not None:
+                for account in pool.accounts:
+                    store.record_sent_count(account.username, account.day, account.sent_today)
+            store.purge(max_age=args.retention)
+            store.close()
+
+    # Timing report, a distinct exit status tells schedulers the run was cut short
+    logger.info(f"Run timings: {budget.report()}")
+    logger.info(f"Run transfers: {transfer_stats}")
+    if timed_out:
+        logger.error(f"Deadline of {args.deadline} seconds exceeded, sent partial digest")
+        sys.exit(EXIT_DEADLINE_EXCEEDED)
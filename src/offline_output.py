@@ -0,0 +1,198 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+import mailbox
+import os
+import socket
+import threading
+import time
+from typing import Iterable
+import uuid
+
+# Custom
+from custom_logger import get_custom_logger
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# Logging
+logger = get_custom_logger("data/configurations/logger.yaml")
+
+# Output formats supported by open_writer
+OUTPUT_FORMATS = ("eml", "maildir", "mbox")
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+class EmlWriter:
+    """Writes each message to its own .eml file in a directory"""
+
+    def __init__(self, directory:str):
+        """Create the writer, creating the directory if needed
+
+        Args:
+            directory (str): directory the .eml files are written to
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def write(self, data:bytes):
+        """Write a message to a new uniquely named .eml file
+
+        Args:
+            data (bytes): serialized message
+        """
+        path = os.path.join(self.directory, f"{uuid.uuid4().hex}.eml")
+        with open(path, "wb") as file:
+            file.write(data)
+
+    def close(self):
+        """Nothing to release, each file is closed once written"""
+
+
+class MaildirWriter:
+    """Delivers each message to the new/ folder of a Maildir
+
+    Messages are written to tmp/ and renamed into new/ so readers never see a
+    partial message, each write touches only its own file so writers can run
+    in parallel.
+    """
+
+    def __init__(self, directory:str):
+        """Create the writer, creating the Maildir folders if needed
+
+        Args:
+            directory (str): root directory of the Maildir
+        """
+        for folder in ("tmp", "new", "cur"):
+            os.makedirs(os.path.join(directory, folder), exist_ok=True)
+        self.directory = directory
+        self.hostname = socket.gethostname().replace("/", "\\057").replace(":", "\\072")
+
+    def write(self, data:bytes):
+        """Deliver a message to new/ by way of tmp/
+
+        Args:
+            data (bytes): serialized message
+        """
+        name = f"{int(time.time())}.{uuid.uuid4().hex}.{self.hostname}"
+        tmp_path = os.path.join(self.directory, "tmp", name)
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, os.path.join(self.directory, "new", name))
+
+    def close(self):
+        """Nothing to release, each message is delivered once written"""
+
+
+class MboxWriter:
+    """Appends messages to a single mbox file, one writer at a time"""
+
+    def __init__(self, path:str):
+        """Open the mbox file and take its lock until the writer is closed
+
+        Args:
+            path (str): path of the mbox file, created if needed
+
+        Raises:
+            mailbox.ExternalClashError: another process holds the mbox lock
+        """
+        self.mbox = mailbox.mbox(path, create=True)
+        self.mbox.lock()
+        self._lock = threading.Lock()
+
+    def write(self, data:bytes):
+        """Append a message to the mbox
+
+        Args:
+            data (bytes): serialized message
+        """
+        with self._lock:
+            self.mbox.add(data)
+
+    def close(self):
+        """Flush the messages, release the mbox lock and close the file"""
+        self.mbox.flush()
+        self.mbox.unlock()
+        self.mbox.close()
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+def open_writer(path:str, output_format:str="eml"):
+    """Open a writer for rendered messages
+
+    Args:
+        path (str): directory for "eml" and "maildir", file for "mbox"
+        output_format (str, optional): one of "eml", "maildir", "mbox". Defaults to "eml".
+
+    Raises:
+        ValueError: unknown output format
+
+    Returns:
+        EmlWriter | MaildirWriter | MboxWriter: writer with write(data) and close()
+    """
+    writers = {"eml": EmlWriter, "maildir": MaildirWriter, "mbox": MboxWriter}
+    if output_format not in writers:
+        logger.error(f"ValueError: unknown output format {output_format}")
+        raise ValueError(f"Unknown output format {output_format}, expected one of {OUTPUT_FORMATS}")
+    logger.info(f"Writing {output_format} output to {path}")
+    return writers[output_format](path)
+
+
+def serialize_message(message:EmailMessage) -> bytes:
+    """Serialize a message once to the bytes every writer stores
+
+    Args:
+        message (EmailMessage): message to serialize
+
+    Returns:
+        bytes: RFC 5322 message with LF line endings
+    """
+    return message.as_bytes()
+
+
+def write_messages(messages:Iterable[EmailMessage], writer, workers:int=4) -> int:
+    """Serialize and write messages with parallel writers
+
+    Messages are pulled from the iterable as writers free up, so at most
+    2 * workers messages are held at once.
+
+    Args:
+        messages (Iterable[EmailMessage]): messages to write
+        writer: writer returned by open_writer
+        workers (int, optional): number of parallel writers. Defaults to 4.
+
+    Returns:
+        int: number of messages written
+    """
+    def write(message:EmailMessage) -> int:
+        data = serialize_message(message)
+        writer.write(data)
+        return len(data)
+
+    start = time.perf_counter()
+    count = 0
+    size = 0
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for message in messages:
+            if len(in_flight) >= 2 * workers:
+                size += in_flight.popleft().result()
+                count += 1
+            in_flight.append(executor.submit(write, message))
+        while in_flight:
+            size += in_flight.popleft().result()
+            count += 1
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Wrote {count} messages ({size} bytes) in {elapsed:.3f}s")
+    return count
@@ -0,0 +1,109 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+from collections import OrderedDict
+import hashlib
+import threading
+from typing import Iterable
+
+# Custom
+from custom_logger import get_custom_logger
+from send_email import EncodedBody, SharedBodyMessage, encode_gmail_body, format_gmail_message_from_body
+from utils import Article, render_articles
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# Logging
+logger = get_custom_logger("data/configurations/logger.yaml")
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+def get_digest_key(template:str, articles:Iterable[Article]) -> str:
+    """Content address of a digest, the same for the same template and articles
+
+    Args:
+        template (str): text preceding the rendered articles
+        articles (Iterable[Article]): articles selected for the digest, in order
+
+    Returns:
+        str: SHA-256 hex digest of the template and the rendered fields of the articles
+    """
+    digest = hashlib.sha256(template.encode())
+    for article in articles:
+        for field in (article.title, article.description, article.url):
+            digest.update(b"\0")
+            digest.update(field.encode())
+    return digest.hexdigest()
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+class RenderCache:
+    """Least recently used cache of encoded digest bodies
+
+    Recipients sharing a digest share one rendered, encoded and flattened
+    body, only their headers are built and serialized per email, so rendering
+    cost scales with the number of distinct digests rather than recipients.
+    """
+
+    def __init__(self, max_entries:int=256):
+        """Create the cache
+
+        Args:
+            max_entries (int, optional): most bodies kept. Defaults to 256.
+        """
+        self.max_entries = max_entries
+        self.bodies = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_body(self, template:str, articles:list) -> EncodedBody:
+        """Get the encoded body of a digest, rendering it on a miss
+
+        Args:
+            template (str): text preceding the rendered articles
+            articles (list): articles selected for the digest, in order
+
+        Returns:
+            EncodedBody: body returned by encode_gmail_body
+        """
+        key = get_digest_key(template, articles)
+        with self._lock:
+            body = self.bodies.get(key)
+            if body is not None:
+                self.bodies.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+
+        body = encode_gmail_body(template + "\n\n".join(render_articles(articles, len(articles))))
+        with self._lock:
+            self.bodies[key] = body
+            if len(self.bodies) > self.max_entries:
+                self.bodies.popitem(last=False)
+        logger.debug(f"Rendered digest {key[:12]}")
+        return body
+
+    def format_message(self, subject:str, sender:str, receiver:str, template:str, articles:list) -> SharedBodyMessage:
+        """Create an email of a digest, sharing its body with other recipients
+
+        Args:
+            subject (str): subject of email to be sent
+            sender (str): Gmail address of sender
+            receiver (str): Gmail address of receiver
+            template (str): text preceding the rendered articles
+            articles (list): articles selected for the digest, in order
+
+        Returns:
+            SharedBodyMessage: email ready for sending
+        """
+        body = self.get_body(template, articles)
+        return format_gmail_message_from_body(subject, sender, receiver, body)
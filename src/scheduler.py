@@ -0,0 +1,247 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+import time as time_module
+from typing import Callable, Iterable
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Third-party
+import yaml
+
+# Custom
+from custom_logger import get_custom_logger
+from deadline import DeadlineExceeded
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# Logging
+logger = get_custom_logger("data/configurations/logger.yaml")
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+@dataclass(frozen=True, slots=True)
+class Recipient:
+    """Recipient of the daily news email and when they would like it
+
+    Attributes:
+        email (str): email address of the recipient
+        topic (str, optional): topic of news to be sent. Defaults to "tesla".
+        timezone (str, optional): IANA time zone of the recipient. Defaults to "UTC".
+        hour (int, optional): preferred local hour of delivery. Defaults to 8.
+    """
+    email: str
+    topic: str = "tesla"
+    timezone: str = "UTC"
+    hour: int = 8
+
+
+@dataclass(frozen=True, slots=True)
+class Slot:
+    """Delivery slot of the send window
+
+    Attributes:
+        start (datetime): UTC time at which the slot is sent
+        recipients (tuple): Recipient objects delivered in the slot
+    """
+    start: datetime
+    recipients: tuple
+
+    @property
+    def topics(self) -> list:
+        """list: distinct topics of the slot, fetched once each"""
+        return sorted({recipient.topic for recipient in self.recipients})
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+def load_recipients(yaml_recipients_file_path:str) -> list:
+    """Load recipients from a YAML file
+
+    Args:
+        yaml_recipients_file_path (str): path to a YAML file of the form
+            recipients:
+              - email: someone@gmail.com
+                topic: climate
+                timezone: Europe/London
+                hour: 7
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+        yaml.YAMLError: If there's an error parsing the YAML file
+        ValueError: If a recipient has an unknown time zone or invalid hour
+
+    Returns:
+        list: Recipient for each entry
+    """
+    logger.info(f"Loading recipients from {yaml_recipients_file_path}...")
+    try:
+        with open(yaml_recipients_file_path, "r") as file:
+            config = yaml.safe_load(file)
+        recipients = [Recipient(**entry) for entry in config["recipients"]]
+        for recipient in recipients:
+            ZoneInfo(recipient.timezone)
+            if not 0 <= recipient.hour <= 23:
+                raise ValueError(f"Invalid hour for {recipient.email}: {recipient.hour}")
+        logger.info(f"Loaded {len(recipients)} recipients")
+        return recipients
+
+    except FileNotFoundError as fe:
+        logger.critical(f"FileNotFoundError: the recipients file was not found: {fe}")
+        raise
+
+    except yaml.YAMLError as ye:
+        logger.critical(f"YAMLError: there was an issue parsing the recipients file: {ye}")
+        raise
+
+    except ZoneInfoNotFoundError as ze:
+        logger.error(f"ValueError: unknown time zone: {ze}")
+        raise ValueError(f"Unknown time zone: {ze}") from ze
+
+    except ValueError as ve:
+        logger.error(f"ValueError: {ve}")
+        raise
+
+
+def get_preferred_time(recipient:Recipient, now:datetime) -> datetime:
+    """Get the UTC time of the next occurrence of a recipient's preferred hour
+
+    The preferred hour is taken on the recipient's local day at now, or on the
+    following local day if it has already passed there.
+
+    Args:
+        recipient (Recipient): recipient of the email
+        now (datetime): aware time from which to look for the preferred hour
+
+    Returns:
+        datetime: preferred delivery time in UTC, at or after now
+    """
+    zone = ZoneInfo(recipient.timezone)
+    day = now.astimezone(zone).date()
+    local = datetime.combine(day, time(recipient.hour), tzinfo=zone)
+    if local < now:
+        local = datetime.combine(day + timedelta(days=1), time(recipient.hour), tzinfo=zone)
+    return local.astimezone(timezone.utc)
+
+
+def assign_slots(recipients:Iterable[Recipient], now:datetime, window_minutes:int=60, slot_minutes:int=5, max_per_slot:int=50) -> list:
+    """Assign each recipient a delivery slot spread evenly over their send window
+
+    Each send window starts at the next occurrence of the recipient's
+    preferred hour, so no slot starts in the past. Recipients sharing a
+    preferred UTC time are spread evenly over the window starting at that
+    time, sorted by topic so that each slot fetches as few topics as possible.
+    Slots are capped at max_per_slot recipients, overflow is carried into the
+    following slots.
+
+    Args:
+        recipients (Iterable[Recipient]): recipients to schedule
+        now (datetime): aware time from which to schedule
+        window_minutes (int, optional): length of each send window. Defaults to 60.
+        slot_minutes (int, optional): length of each slot. Defaults to 5.
+        max_per_slot (int, optional): most recipients delivered in a slot. Defaults to 50.
+
+    Returns:
+        list: Slot objects sorted by start time
+    """
+    if slot_minutes <= 0 or window_minutes < slot_minutes or max_per_slot <= 0:
+        raise ValueError("Slots must be positive, fit in the window, and hold at least one recipient")
+    step = timedelta(minutes=slot_minutes)
+    number_slots = window_minutes // slot_minutes
+
+    # Group recipients by the start of their send window
+    windows = {}
+    for recipient in recipients:
+        windows.setdefault(get_preferred_time(recipient, now), []).append(recipient)
+
+    # Spread each window evenly over its slots
+    buckets = {}
+    for start, window in windows.items():
+        window.sort(key=lambda recipient: (recipient.topic, recipient.email))
+        for i, recipient in enumerate(window):
+            slot_start = start + step * (i * number_slots // len(window))
+            buckets.setdefault(slot_start, []).append(recipient)
+
+    # Cap each slot, carrying overflow into the next slot
+    slots = []
+    carry = []
+    cursor = None
+    for start in sorted(buckets):
+        while carry and cursor < start:
+            slots.append(Slot(cursor, tuple(carry[:max_per_slot])))
+            carry = carry[max_per_slot:]
+            cursor += step
+        if not carry:
+            cursor = start
+        carry.extend(buckets[start])
+    while carry:
+        slots.append(Slot(cursor, tuple(carry[:max_per_slot])))
+        carry = carry[max_per_slot:]
+        cursor += step
+
+    logger.info(f"Assigned {sum(len(slot.recipients) for slot in slots)} recipients to {len(slots)} slots")
+    return slots
+
+
+def run_schedule(slots:Iterable[Slot], fetch:Callable, send:Callable, lead:timedelta=timedelta(minutes=5), now:Callable=None, sleep:Callable=time_module.sleep, deadline=None):
+    """Fetch and send each slot at its time, one slot at a time
+
+    The topics of a slot are fetched once each, lead before the slot starts,
+    so the freshest content is used while at most one slot is in flight. A
+    topic that fails to fetch is sent as no articles and a slot that fails to
+    send is logged, neither stops the rest of the schedule.
+
+    Args:
+        slots (Iterable[Slot]): slots sorted by start time
+        fetch (Callable): fetch(topic) returning the articles of a topic
+        send (Callable): send(slot, articles) where articles maps each topic
+            of the slot to its articles
+        lead (timedelta, optional): time before a slot its topics are fetched. Defaults to 5 minutes.
+        now (Callable, optional): returns the current UTC time. Defaults to datetime.now(timezone.utc).
+        sleep (Callable, optional): sleeps for a number of seconds. Defaults to time.sleep.
+        deadline (Deadline, optional): deadline of the whole schedule. Defaults to None.
+
+    Raises:
+        DeadlineExceeded: the deadline passes before every slot is sent
+    """
+    if now is None:
+        now = lambda: datetime.now(timezone.utc)
+
+    def wait_until(moment:datetime):
+        delay = (moment - now()).total_seconds()
+        remaining = None if deadline is None else deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            sleep(remaining)
+            raise DeadlineExceeded(f"Deadline exceeded before slot at {moment.isoformat()}")
+        if delay > 0:
+            sleep(delay)
+
+    def fetch_topic(topic:str) -> list:
+        try:
+            return fetch(topic)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error: could not fetch {topic}, its recipients are skipped: {e}")
+            return []
+
+    for slot in slots:
+        wait_until(slot.start - lead)
+        logger.info(f"Fetching {len(slot.topics)} topics for slot {slot.start.isoformat()}...")
+        articles = {topic: fetch_topic(topic) for topic in slot.topics}
+        wait_until(slot.start)
+        logger.info(f"Sending slot {slot.start.isoformat()} to {len(slot.recipients)} recipients...")
+        try:
+            send(slot, articles)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error: could not send slot {slot.start.isoformat()}, moving on to the next slot: {e}")
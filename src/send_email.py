@@ -3,13 +3,21 @@
 # =============================================================================
 
 # Python
+from datetime import date
+from email.generator import BytesGenerator
 from email.message import EmailMessage
+from email.utils import getaddresses
+import io
+import queue
 import re
 import smtplib
 import ssl
+import threading
+import time
 
 # Custom
 from custom_logger import get_custom_logger
+from deadline import Deadline, shutdown_on_expiry
 
 # =============================================================================
 # Variables
@@ -58,7 +66,62 @@ def format_gmail_message(subject:str, sender:str, receiver:str, message:str):
             f"RuntimeError: unexpected error occurred in format_gmail_message: {e}"
         ) from e
 
-def send_gmail_from_ppw(username:str, password:str, message:str, host:str="smtp.gmail.com", port:int=465):
+def encode_gmail_body(message:str):
+    """Encode the content of an email once so it can be shared by many emails
+
+    Args:
+        message (str): Message content of email
+
+    Returns:
+        EncodedBody: content headers and encoded body, flattened once
+    """
+    body = EmailMessage()
+    body.set_content(message)
+    return EncodedBody(body)
+
+def format_gmail_message_from_body(subject:str, sender:str, receiver:str, body):
+    """Create a Gmail message object around an already encoded body
+
+    Only the per-recipient headers are new, the content headers and encoded
+    payload are shared with the body and serialized from its cached bytes.
+
+    Args:
+        subject (str): subject of email to be sent
+        sender (str): Gmail address of sender
+        receiver (str): Gmail address of receiver
+        body (EncodedBody): body returned by encode_gmail_body
+
+    Returns:
+        object: SharedBodyMessage object read for sending
+    """
+    # Check valid gmail email addresses
+    pattern = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
+    assert re.match(pattern, sender), f"Invalid sender Gmail address: {sender}"
+    assert re.match(pattern, receiver), f"Invalid sender Gmail address: {receiver}"
+
+    msg = SharedBodyMessage(body)
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = receiver
+    return msg
+
+def send_smtp_message(server:smtplib.SMTP, message:EmailMessage):
+    """Send a message over an open SMTP session
+
+    A SharedBodyMessage is sent from its own bytes, so its body is not
+    flattened again for each recipient.
+
+    Args:
+        server (smtplib.SMTP): logged in SMTP session
+        message (EmailMessage): message to send
+    """
+    if not isinstance(message, SharedBodyMessage):
+        server.send_message(message)
+        return
+    to_addrs = [address for _, address in getaddresses(message.get_all("To", []))]
+    server.sendmail(message["From"], to_addrs, message.as_bytes(policy=message.policy.clone(linesep="\r\n")))
+
+def send_gmail_from_ppw(username:str, password:str, message:str, host:str="smtp.gmail.com", port:int=465, timeout:float=None, deadline:Deadline=None):
     """The function sends an email message from the sender to the receiver by SMTP gmail and SSL
 
     Args:
@@ -67,6 +130,10 @@ def send_gmail_from_ppw(username:str, password:str, message:str, host:str="smtp.
         message (str): messgae to be emailed
         host (str, optional): host for SMTP server. Defaults to "smtp.gmail.com".
         port (int, optional): port for SMTP server. Defaults to 465.
+        timeout (float, optional): seconds each blocking SMTP operation, including the
+            TLS handshake, may take. Defaults to no limit.
+        deadline (Deadline, optional): deadline of the whole session, the socket
+            timeout is cut to the time left before each step. Defaults to None.
     """
     # Check valid gmail email addresses
     pattern = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
@@ -93,9 +160,17 @@ def send_gmail_from_ppw(username:str, password:str, message:str, host:str="smtp.
 
     try:
         logger.info(f"Starting SMTP server {host}:{port}...")
-        with smtplib.SMTP_SSL(host, port, context=context) as server:
+        # Only bound the session when a timeout is given
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+        session_options = {"context": context} if timeout is None else {"context": context, "timeout": timeout}
+        with smtplib.SMTP_SSL(host, port, **session_options) as server, shutdown_on_expiry(server.sock, deadline):
+            if deadline is not None:
+                server.sock.settimeout(deadline.timeout(timeout))
             server.login(username, password)
-            server.send_message(message)
+            if deadline is not None:
+                server.sock.settimeout(deadline.timeout(timeout))
+            send_smtp_message(server, message)
             logger.info(f"Email sent")
     except smtplib.SMTPAuthenticationError as eauth:
         logger.critical(f"SMTPAuthenticationError: authentication failed. Check your username and password: {eauth}")
@@ -106,8 +181,418 @@ def send_gmail_from_ppw(username:str, password:str, message:str, host:str="smtp.
     except smtplib.SMTPException as esmtp:
         logger.critical(f"SMTPException: SMTP error occurred: {esmtp}")
         raise
+    except TimeoutError as etime:
+        logger.critical(f"TimeoutError: SMTP server {host}:{port} timed out: {etime}")
+        raise
+    except OSError as eos:
+        logger.critical(f"OSError: connection to SMTP server {host}:{port} failed: {eos}")
+        raise
     except Exception as e:
         logger.critical(f"Error: an unexpected error occurred: {e}")
         raise RuntimeError(
             f"RuntimeError: unexpected error occurred in send_gmail_from_ppw: {e}"
-        ) from e
\ No newline at end of file
+        ) from e
+
+def parse_sender_accounts(accounts:str, daily_quota:int=500, max_sessions:int=2) -> list:
+    """Parse sender accounts from a string of comma separated username:password pairs
+
+    Args:
+        accounts (str): e.g. "a@gmail.com:app_password,b@gmail.com:app_password"
+        daily_quota (int, optional): messages each account may send per day. Defaults to 500.
+        max_sessions (int, optional): concurrent SMTP sessions per account. Defaults to 2.
+
+    Raises:
+        ValueError: an account is not of the form username:password
+
+    Returns:
+        list: SenderAccount for each pair
+    """
+    sender_accounts = []
+    for pair in accounts.split(","):
+        username, separator, password = pair.strip().partition(":")
+        if not separator or not username or not password:
+            logger.error("ValueError: sender accounts must be of the form username:password")
+            raise ValueError("Sender accounts must be of the form username:password")
+        sender_accounts.append(SenderAccount(username, password, daily_quota=daily_quota, max_sessions=max_sessions))
+    return sender_accounts
+
+
+def _smtp_error_bytes(error:smtplib.SMTPResponseException) -> bytes:
+    return error.smtp_error if isinstance(error.smtp_error, bytes) else str(error.smtp_error).encode()
+
+
+def is_daily_limit_error(error:smtplib.SMTPException) -> bool:
+    """Check whether an SMTP error means the account reached its daily sending limit
+
+    Gmail answers 550 5.4.5 once the daily sending limit is reached.
+
+    Args:
+        error (smtplib.SMTPException): error raised by the SMTP server
+
+    Returns:
+        bool: True if the account cannot send again today
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if not isinstance(error, smtplib.SMTPResponseException):
+        return False
+    return error.smtp_code == 550 and b"5.4.5" in _smtp_error_bytes(error)
+
+
+def is_session_limit_error(error:smtplib.SMTPException) -> bool:
+    """Check whether an SMTP error is a temporary session or rate limit
+
+    Gmail answers 421 when too many sessions are open or it wants the client
+    to try again later, and 454 for temporary service limits.
+
+    Args:
+        error (smtplib.SMTPException): error raised by the SMTP server
+
+    Returns:
+        bool: True if the account should back off and retry in a new session
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if not isinstance(error, smtplib.SMTPResponseException):
+        return False
+    return error.smtp_code in (421, 454)
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+class EncodedBody:
+    """Content headers and encoded payload of an email shared by its recipients
+
+    The body is flattened to bytes once for each line separator, messages
+    built around it only serialize their own headers.
+    """
+
+    def __init__(self, message:EmailMessage):
+        """Wrap an encoded body
+
+        Args:
+            message (EmailMessage): message holding only the content headers and encoded payload
+        """
+        self.message = message
+        self.header_names = {name.lower() for name in message.keys()}
+        self._flattened = {}
+        self._lock = threading.Lock()
+
+    def flatten(self, linesep:str="\n") -> bytes:
+        """Content headers, blank line and encoded payload as bytes
+
+        Args:
+            linesep (str, optional): line separator. Defaults to "\n".
+
+        Returns:
+            bytes: flattened body, computed once for each line separator
+        """
+        with self._lock:
+            data = self._flattened.get(linesep)
+            if data is None:
+                buffer = io.BytesIO()
+                BytesGenerator(buffer, policy=self.message.policy.clone(linesep=linesep)).flatten(self.message)
+                data = self._flattened[linesep] = buffer.getvalue()
+            return data
+
+
+class SharedBodyMessage(EmailMessage):
+    """Email whose content headers and payload are shared with an EncodedBody
+
+    The headers list is its own, so per-recipient headers can be added or
+    replaced, while serializing prepends only those headers to the cached
+    bytes of the body.
+    """
+
+    def __init__(self, body:EncodedBody):
+        """Create a message around a shared body
+
+        Args:
+            body (EncodedBody): body returned by encode_gmail_body
+        """
+        super().__init__(policy=body.message.policy)
+        # Shares the payload, copies only the list of headers
+        self.__dict__.update(body.message.__dict__)
+        self._headers = list(body.message._headers)
+        self.body = body
+
+    def as_bytes(self, unixfrom:bool=False, policy=None) -> bytes:
+        if unixfrom:
+            return super().as_bytes(unixfrom=unixfrom, policy=policy)
+        policy = self.policy if policy is None else policy
+        headers = b"".join(
+            policy.fold_binary(name, value)
+            for name, value in self._headers
+            if name.lower() not in self.body.header_names
+        )
+        return headers + self.body.flatten(policy.linesep)
+
+    def __bytes__(self) -> bytes:
+        return self.as_bytes()
+
+
+class SenderAccount:
+    """Gmail sender account with its daily quota and session limit
+
+    Quota is reserved before each message and settled after it so concurrent
+    sessions of the same account never overshoot the daily limit.
+    """
+
+    def __init__(self, username:str, password:str, daily_quota:int=500, max_sessions:int=2, sent_today:int=0):
+        """Create a sender account
+
+        Args:
+            username (str): Gmail address of sender
+            password (str): password of sender Gmail address
+            daily_quota (int, optional): messages the account may send per day. Defaults to 500.
+            max_sessions (int, optional): concurrent SMTP sessions for the account. Defaults to 2.
+            sent_today (int, optional): messages already sent today. Defaults to 0.
+        """
+        pattern = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
+        assert re.match(pattern, username), f"Invalid sender Gmail address: {username}"
+        self.username = username
+        self.password = password
+        self.daily_quota = daily_quota
+        self.max_sessions = max_sessions
+        self.sent_today = sent_today
+        self.day = date.today()
+        self.disabled = False
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"SenderAccount({self.username!r}, remaining_quota={self.remaining_quota})"
+
+    @property
+    def remaining_quota(self) -> int:
+        """int: messages the account can still send today"""
+        if self.disabled:
+            return 0
+        if self.day != date.today():
+            self.day = date.today()
+            self.sent_today = 0
+        return max(self.daily_quota - self.sent_today - self._reserved, 0)
+
+    def reserve(self) -> bool:
+        """Reserve quota for one message, False if the account is exhausted"""
+        with self._lock:
+            if self.remaining_quota <= 0:
+                return False
+            self._reserved += 1
+            return True
+
+    def settle(self, sent:bool):
+        """Release a reservation, counting it against the quota if it was sent"""
+        with self._lock:
+            self._reserved -= 1
+            if sent:
+                self.sent_today += 1
+
+    def exhaust(self):
+        """Mark the daily quota as used up after the server reported it"""
+        with self._lock:
+            self.sent_today = self.daily_quota
+
+    def disable(self):
+        """Stop using the account, e.g. after an authentication failure"""
+        with self._lock:
+            self.disabled = True
+
+
+class SenderPool:
+    """Pool of Gmail sender accounts sending messages concurrently
+
+    Each account runs up to max_sessions SMTP sessions that pull messages from
+    a shared queue. An account that fails authentication or hits its quota
+    hands its message back to the queue for the other accounts. A session
+    told to back off by a temporary session limit requeues its message, waits
+    and reconnects, one whose connection is dropped reconnects straight away.
+    """
+
+    def __init__(self, accounts:list, host:str="smtp.gmail.com", port:int=465, session_backoff:float=30.0, session_retries:int=3):
+        """Create a pool of sender accounts
+
+        Args:
+            accounts (list): SenderAccount objects to send from
+            host (str, optional): host for SMTP server. Defaults to "smtp.gmail.com".
+            port (int, optional): port for SMTP server. Defaults to 465.
+            session_backoff (float, optional): seconds a session waits after a
+                temporary session limit before reconnecting. Defaults to 30.0.
+            session_retries (int, optional): times a session reconnects after a
+                temporary session limit or a dropped connection before giving
+                up. Defaults to 3.
+        """
+        if not accounts:
+            raise ValueError("Sender pool needs at least one account")
+        self.accounts = accounts
+        self.host = host
+        self.port = port
+        self.session_backoff = session_backoff
+        self.session_retries = session_retries
+
+    @property
+    def remaining_quota(self) -> int:
+        """int: messages the pool can still send today"""
+        return sum(account.remaining_quota for account in self.accounts)
+
+    def send(self, messages:list, deadline=None) -> list:
+        """Send messages spread across the accounts of the pool
+
+        The From header of each message is set to the account sending it.
+
+        Args:
+            messages (list): EmailMessage objects to send
+            deadline (Deadline, optional): deadline after which no more messages
+                are sent and blocking SMTP operations time out. Defaults to None.
+
+        Returns:
+            list: messages that could not be sent by any account
+        """
+        logger.info(f"Sending {len(messages)} emails from {len(self.accounts)} accounts...")
+        try:
+            context = ssl.create_default_context()
+        except ssl.SSLError as se:
+            logger.critical(f"SSL error: encountered when created SSL context: {se}")
+            raise
+
+        work = queue.Queue()
+        for message in messages:
+            work.put(message)
+        sent_ids = set()
+        state = {"pending": len(messages), "closed": False}
+        state_lock = threading.Lock()
+
+        def finish(message, sent:bool):
+            with state_lock:
+                if state["closed"]:
+                    # Already reported unsent, a late session cannot change that
+                    if sent:
+                        logger.warning(f"Email to {message['To']} was sent after the pool stopped waiting for it")
+                    return
+                state["pending"] -= 1
+                if sent:
+                    sent_ids.add(id(message))
+
+        def session(account:SenderAccount):
+            server = None
+            retries = 0
+
+            def close():
+                try:
+                    server.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+
+            def reconnect(message, delay:float=0.0) -> bool:
+                # Close the session and open a new one after delay seconds,
+                # False once the session has reconnected too often
+                nonlocal server, retries
+                work.put(message)
+                if server is not None:
+                    close()
+                    server = None
+                retries += 1
+                if retries > self.session_retries:
+                    return False
+                if deadline is not None:
+                    delay = min(delay, deadline.remaining())
+                if delay > 0:
+                    time.sleep(delay)
+                return True
+
+            def back_off(error, message) -> bool:
+                # Temporary limit, close the session and reconnect later
+                logger.warning(f"Account {account.username} hit a session limit, backing off: {error}")
+                return reconnect(message, delay=self.session_backoff)
+
+            try:
+                while state["pending"] > 0 and not state["closed"] and not (deadline is not None and deadline.expired):
+                    if not account.reserve():
+                        return
+                    try:
+                        message = work.get(timeout=0.1)
+                    except queue.Empty:
+                        account.settle(sent=False)
+                        continue
+                    try:
+                        # Each step only gets the time left before the deadline
+                        if server is None:
+                            timeout = None if deadline is None else deadline.timeout()
+                            server = smtplib.SMTP_SSL(self.host, self.port, context=context, timeout=timeout)
+                            with shutdown_on_expiry(server.sock, deadline):
+                                if deadline is not None:
+                                    server.sock.settimeout(deadline.timeout())
+                                server.login(account.username, account.password)
+                        if deadline is not None:
+                            server.sock.settimeout(deadline.timeout())
+                        del message["From"]
+                        message["From"] = account.username
+                        with shutdown_on_expiry(server.sock, deadline):
+                            send_smtp_message(server, message)
+                        account.settle(sent=True)
+                        finish(message, sent=True)
+                    except smtplib.SMTPAuthenticationError as eauth:
+                        logger.error(f"SMTPAuthenticationError: disabling account {account.username}: {eauth}")
+                        account.settle(sent=False)
+                        account.disable()
+                        work.put(message)
+                        return
+                    except smtplib.SMTPConnectError as econn:
+                        account.settle(sent=False)
+                        if is_session_limit_error(econn):
+                            if back_off(econn, message):
+                                continue
+                            return
+                        logger.error(f"SMTPConnectError: unable to connect for account {account.username}: {econn}")
+                        work.put(message)
+                        return
+                    except smtplib.SMTPServerDisconnected as edisc:
+                        # Gmail closes long or idle sessions, open a new one
+                        logger.warning(f"SMTPServerDisconnected: reconnecting account {account.username}: {edisc}")
+                        account.settle(sent=False)
+                        if reconnect(message):
+                            continue
+                        return
+                    except smtplib.SMTPException as esmtp:
+                        account.settle(sent=False)
+                        if is_daily_limit_error(esmtp):
+                            logger.warning(f"Account {account.username} hit its daily sending limit: {esmtp}")
+                            account.exhaust()
+                            work.put(message)
+                            return
+                        if is_session_limit_error(esmtp):
+                            if back_off(esmtp, message):
+                                continue
+                            return
+                        logger.error(f"SMTPException: could not send email to {message['To']}: {esmtp}")
+                        finish(message, sent=False)
+                    except OSError as econn:
+                        logger.error(f"SMTP connection error for account {account.username}: {econn}")
+                        account.settle(sent=False)
+                        work.put(message)
+                        return
+            finally:
+                if server is not None:
+                    close()
+
+        threads = [
+            threading.Thread(target=session, args=(account,), daemon=True)
+            for account in self.accounts
+            for _ in range(account.max_sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        # One end time for all sessions, so hung sessions do not add up
+        end = None if deadline is None else time.monotonic() + deadline.remaining() + 1.0
+        for thread in threads:
+            thread.join(None if end is None else max(end - time.monotonic(), 0.0))
+
+        # Stop sessions still running past the deadline, every message not
+        # sent by now is failed, whether rejected, left over once every account
+        # is exhausted or disabled, or still in flight
+        with state_lock:
+            state["closed"] = True
+            failed = [message for message in messages if id(message) not in sent_ids]
+        logger.info(f"Sent {len(messages) - len(failed)} of {len(messages)} emails")
+        return failed
@@ -3,13 +3,30 @@
 # =============================================================================
 
 # Python
+from dataclasses import dataclass
+from itertools import islice
+import json
 import os
+from typing import Iterable, Iterator
+import zlib
 
 # Third-party
 import requests
+import urllib3
+
+# Brotli is optional, br responses are only requested when it is installed
+try:
+    import brotli
+    ACCEPT_ENCODING = "br, gzip"
+    DECODE_ERRORS = (zlib.error, brotli.error)
+except ImportError:
+    brotli = None
+    ACCEPT_ENCODING = "gzip"
+    DECODE_ERRORS = (zlib.error,)
 
 # Custom
 from custom_logger import get_custom_logger
+from deadline import Deadline, DeadlineExceeded, shutdown_on_expiry
 
 # =============================================================================
 # Variables
@@ -18,6 +35,99 @@ from custom_logger import get_custom_logger
 # Logging
 logger = get_custom_logger("data/configurations/logger.yaml")
 
+# Bytes read from an HTTP response between deadline checks
+CHUNK_SIZE = 16384
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+@dataclass(frozen=True, slots=True)
+class Article:
+    """Compact, immutable record of the article fields used in an email
+
+    Attributes:
+        title (str): title of the article
+        description (str): description of the article
+        url (str): link to the article
+        published_at (str, optional): publication time of the article
+    """
+    title: str
+    description: str
+    url: str
+    published_at: str = None
+
+
+@dataclass(slots=True)
+class TransferStats:
+    """Bytes transferred by HTTP fetches of a run
+
+    Attributes:
+        fetches (int): number of HTTP responses read
+        compressed_bytes (int): bytes received over the wire
+        decompressed_bytes (int): bytes of the decoded response bodies
+    """
+    fetches: int = 0
+    compressed_bytes: int = 0
+    decompressed_bytes: int = 0
+
+    def record(self, compressed_bytes:int, decompressed_bytes:int):
+        """Add the bytes of one fetch"""
+        self.fetches += 1
+        self.compressed_bytes += compressed_bytes
+        self.decompressed_bytes += decompressed_bytes
+
+    def __str__(self) -> str:
+        ratio = self.decompressed_bytes / self.compressed_bytes if self.compressed_bytes else 1.0
+        return (
+            f"{self.fetches} fetches, {self.compressed_bytes} bytes received, "
+            f"{self.decompressed_bytes} bytes decompressed ({ratio:.1f}x)"
+        )
+
+
+class ContentDecoder:
+    """Decodes a response body as it is read off the wire, counting the bytes received
+
+    urllib3 only counts the bytes it reads itself when a response has a
+    Content-Length, so chunked responses are read undecoded and decoded here.
+
+    Args:
+        content_encoding (str, optional): Content-Encoding header of the
+            response. Defaults to identity.
+
+    Attributes:
+        received_bytes (int): bytes of the body received before decoding
+
+    Raises:
+        ContentDecodingError: the encoding is not supported
+    """
+    def __init__(self, content_encoding:str=None):
+        encoding = (content_encoding or "identity").strip().lower()
+        self.received_bytes = 0
+        if encoding == "identity":
+            self._decompress, self._flush = bytes, bytes
+        elif encoding in ("gzip", "x-gzip", "deflate"):
+            # 32 lets zlib detect a gzip or zlib header
+            decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+            self._decompress, self._flush = decompressor.decompress, decompressor.flush
+        elif encoding == "br" and brotli is not None:
+            decompressor = brotli.Decompressor()
+            self._decompress, self._flush = decompressor.process, bytes
+        else:
+            raise requests.exceptions.ContentDecodingError(f"Unsupported Content-Encoding: {content_encoding}")
+
+    def decode(self, chunk:bytes) -> bytes:
+        """Count and decode one chunk read off the wire"""
+        self.received_bytes += len(chunk)
+        try:
+            return self._decompress(chunk)
+        except DECODE_ERRORS as decode_err:
+            raise requests.exceptions.ContentDecodingError(decode_err) from decode_err
+
+    def flush(self) -> bytes:
+        """Return the decoded bytes still buffered at the end of the body"""
+        return self._flush()
+
 # =============================================================================
 # Functions
 # =============================================================================
@@ -75,32 +185,72 @@ def get_news_api_endpoint(api_key:str, topic="tesla") -> str:
 
 def get_http_response(url:str, headers:str={
     "User-Agent": 
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
-    }) -> dict:
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    }, timeout:float=None, stats:TransferStats=None, deadline:Deadline=None) -> dict:
     """_Get HTTP response from endpoint and return JSON of response
 
     Args:
         url (str): URL of the endpoint to send HTTP request
         headers (str, optional): Headers for senfind HTTP request. Defaults to HEADERS.
+        timeout (float, optional): seconds to wait on the connection and each read. Defaults to no limit.
+        stats (TransferStats, optional): records the compressed and decompressed
+            bytes of the response. Defaults to None.
+        deadline (Deadline, optional): deadline of the whole request, checked
+            between each chunk of the body. Defaults to None.
 
     Raises:
         HTTPError: 4xx, client networking error
         ConnectionError: connection error with endpoint
         TimeOutError: time out error at endpoint
         RequestException: request error at endpoint
+        DeadlineExceeded: the deadline passed before the body was read
 
     Returns:
         object: JSON object of the HTTP response
     """
     try:
         logger.info("Sending HTTP request...")
-        response = requests.get(url=url, headers=headers)
-        response.raise_for_status()
-        logger.info("Received HTTP response")
-        content = response.json()
-        logger.debug(f"HTTP response from {url}: {content}")
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+        # Streamed so the body can be cut off when the deadline passes
+        response = requests.get(url=url, headers=headers, timeout=timeout, stream=True)
+        try:
+            response.raise_for_status()
+            logger.info("Received HTTP response")
+            body = bytearray()
+            decoder = ContentDecoder(response.headers.get("Content-Encoding"))
+            try:
+                with shutdown_on_expiry(response.raw, deadline):
+                    for chunk in iter_raw_content(response.raw):
+                        if deadline is not None and deadline.expired:
+                            raise DeadlineExceeded(f"Deadline exceeded after {len(body)} bytes of the HTTP response")
+                        body += decoder.decode(chunk)
+                body += decoder.flush()
+            except requests.exceptions.RequestException as req_err:
+                # The connection was shut down under the read by the deadline
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded(f"Deadline exceeded after {len(body)} bytes of the HTTP response") from req_err
+                raise
+            content = json.loads(body)
+            if stats is not None:
+                stats.record(decoder.received_bytes, len(body))
+                logger.debug(
+                    f"Received {decoder.received_bytes} bytes as {response.headers.get('Content-Encoding', 'identity')}, "
+                    f"decompressed to {len(body)} bytes"
+                )
+            # Only a summary is logged, formatting the payload would copy it whole
+            number_articles = len(content.get("articles", [])) if isinstance(content, dict) else 0
+            logger.debug(f"HTTP response of {len(body)} bytes with {number_articles} articles")
+        finally:
+            # Release the connection back to the pool, also on an error status
+            response.close()
         return content
-        
+
+    except DeadlineExceeded as de:
+        logger.error(f"Deadline exceeded: {de}")
+        raise
+
     except requests.exceptions.HTTPError as http_err:
         logger.error(f"HTTP error: {http_err}")
         raise
@@ -121,69 +271,128 @@ def get_http_response(url:str, headers:str={
         logger.critical(f"Error: {e}")
         raise
     
-def get_article_title_description_link(content:dict, number_articles:int=20) -> str:
-    """Get the title and description of the articles contained in the content dictionary
+def iter_raw_content(raw:urllib3.response.HTTPResponse) -> Iterator[bytes]:
+    """Read the body of a streamed response as received, before any decoding
+
+    Chunked transfer encoding is removed, content encoding is kept. urllib3
+    errors are raised as the requests errors iter_content would raise.
+
+    Args:
+        raw (HTTPResponse): raw urllib3 response of a streamed request
+
+    Raises:
+        ChunkedEncodingError: the connection broke or a chunk was malformed
+        ConnectionError: a read timed out
+        SSLError: TLS error while reading
+
+    Yields:
+        bytes: chunks of at most CHUNK_SIZE bytes of the encoded body
+    """
+    try:
+        yield from raw.stream(CHUNK_SIZE, decode_content=False)
+    except urllib3.exceptions.ProtocolError as protocol_err:
+        raise requests.exceptions.ChunkedEncodingError(protocol_err) from protocol_err
+    except urllib3.exceptions.ReadTimeoutError as timeout_err:
+        raise requests.exceptions.ConnectionError(timeout_err) from timeout_err
+    except urllib3.exceptions.SSLError as ssl_err:
+        raise requests.exceptions.SSLError(ssl_err) from ssl_err
+
+
+def iter_articles(content:dict) -> Iterator[Article]:
+    """Lazily validate the articles of a News API response as Article records
+
+    Only the fields needed downstream are pulled from each raw article, so the
+    caller can drop the response once it has consumed what it needs.
 
     Args:
         content (dict): Dictionary containing article title and description values
                         Expected structure:
                         {
-                            "article": [
+                            "articles": [
                                 {
                                     "title": "Breaking News",
                                     "description": "This is the latest news update.",
+                                    "url": "https://...",
                                     ...
                                 },
                                 ...
                             ],
                             ...
                         }
-        number_articles (int): the first number of articles to include in message for SMTP email
 
-    Returns:
-        str: A formatted string of titles, descriptions, and links ready for parsing in an SMTP email
+    Yields:
+        Article: record of each article, articles without a title,
+                 description, or url are skipped
 
     Raises:
         ValueError: If required keys are missing
         TypeError: If values are not in the expected format
     """
-    logger.info("Generating string with titles, descriptions, and urls of articles...")
     try:
-        # Check if "article" key exists and is a list
+        # Check if "articles" key exists and is a list
         if "articles" not in content:
             raise ValueError("Key 'articles' is missing from argument")
         if not isinstance(content["articles"], list):
             raise TypeError("Value of 'articles' must be a list of dictionaries")
 
-        articles = content["articles"][:number_articles]
-        message = ""
-
-        for i, article in enumerate(articles):
+        for article in content["articles"]:
             # Check article is a dict
             if not isinstance(article, dict):
                 raise TypeError("Each article must be a dictionary")
             # Check title, description, and url keys exist
             if "title" not in article or "description" not in article or "url" not in article:
                 raise ValueError("Each article must contain 'title', 'description', and 'url' keys")
-            # Do not add empty values to message
+            # Do not yield empty articles
             if article["title"] is None and article["description"] is None and article["url"] is None:
-                pass
-            elif not isinstance(article["title"], str) or not isinstance(article["description"], str) or not isinstance(article["url"], str):
+                continue
+            if not isinstance(article["title"], str) or not isinstance(article["description"], str) or not isinstance(article["url"], str):
                 raise TypeError("'title', 'description', 'url' must be strings.")
-            else:
-                message += f"[{i+1}]\nTitle: {article['title']}\nDescription: {article['description']}\nLink: {article['url']}\n\n"
-
-        logger.info("Generated string with titles, descriptions, and urls of articles")
-        return message.strip()
+            yield Article(
+                title=article["title"],
+                description=article["description"],
+                url=article["url"],
+                published_at=article.get("publishedAt"),
+            )
 
     except ValueError as e:
         logger.error(f"ValueError: {e}")
         raise
-    
+
     except TypeError as e:
         logger.error(f"TypeError: {e}")
         raise
-    
-    except Exception as e:
-        logger.critical(f"Error: {e}")
-        raise 
\ No newline at end of file
+
+
+def render_articles(articles:Iterable[Article], number_articles:int=20) -> Iterator[str]:
+    """Lazily render the first articles as numbered entries of an SMTP email
+
+    Args:
+        articles (Iterable[Article]): articles to render
+        number_articles (int): the first number of articles to render
+
+    Yields:
+        str: formatted title, description, and link of each article
+    """
+    for i, article in enumerate(islice(articles, number_articles)):
+        yield f"[{i+1}]\nTitle: {article.title}\nDescription: {article.description}\nLink: {article.url}"
+
+
+def get_article_title_description_link(content:dict, number_articles:int=20) -> str:
+    """Get the title and description of the articles contained in the content dictionary
+
+    Args:
+        content (dict): Dictionary containing article title and description
+                        values, see iter_articles for the expected structure
+        number_articles (int): the first number of articles to include in message for SMTP email
+
+    Returns:
+        str: A formatted string of titles, descriptions, and links ready for parsing in an SMTP email
+
+    Raises:
+        ValueError: If required keys are missing
+        TypeError: If values are not in the expected format
+    """
+    logger.info("Generating string with titles, descriptions, and urls of articles...")
+    message = "\n\n".join(render_articles(iter_articles(content), number_articles))
+    logger.info("Generated string with titles, descriptions, and urls of articles")
+    return message
\ No newline at end of file
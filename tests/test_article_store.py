@@ -0,0 +1,101 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+from datetime import date
+import time
+import unittest
+from unittest.mock import patch
+
+# Testing
+from article_store import ArticleStore, build_match_query
+from utils import Article
+
+# =============================================================================
+# Tests
+# =============================================================================
+
+ARTICLES = [
+    Article("Tesla earnings", "Electric cars", "http://link1.com", "2025-02-07T10:00:00Z"),
+    Article("Climate change", "Tesla batteries", "http://link2.com", "2025-02-07T11:00:00Z"),
+    Article("Football", "Match report", "http://link3.com", "2025-02-07T12:00:00Z"),
+]
+
+
+class BaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.patcher_logger = patch("article_store.logger")
+        self.mock_logger = self.patcher_logger.start()
+        self.store = ArticleStore(":memory:")
+
+    def tearDown(self):
+        self.store.close()
+        self.patcher_logger.stop()
+
+
+class TestBuildMatchQuery(unittest.TestCase):
+    def test_terms_are_quoted(self):
+        self.assertEqual(build_match_query('climate "change"'), '"climate" """change"""')
+
+    def test_empty_topic_raises(self):
+        with self.assertRaises(ValueError):
+            build_match_query("  ")
+
+
+class TestArticleStore(BaseTestCase):
+    def test_ingest_deduplicates_by_url(self):
+        self.assertEqual(self.store.ingest(ARTICLES), 3)
+        self.assertEqual(self.store.ingest(ARTICLES), 0)
+
+    def test_search_newest_first(self):
+        self.store.ingest(ARTICLES)
+        result = self.store.search("tesla")
+        self.assertEqual([a.url for a in result], ["http://link2.com", "http://link1.com"])
+        self.assertEqual(result[0], ARTICLES[1])
+
+    def test_search_respects_max_age(self):
+        self.store.ingest(ARTICLES, fetched_at=time.time() - 7200)
+        self.assertEqual(self.store.search("tesla", max_age=3600), [])
+
+    def test_get_fresh_articles_hit_and_miss(self):
+        self.store.ingest(ARTICLES)
+        self.assertEqual(len(self.store.get_fresh_articles("tesla", number_articles=2)), 2)
+        self.assertIsNone(self.store.get_fresh_articles("tesla", number_articles=3))
+
+    def test_refetch_makes_articles_fresh(self):
+        self.store.ingest(ARTICLES, fetched_at=time.time() - 7200)
+        self.assertIsNone(self.store.get_fresh_articles("tesla", number_articles=2, max_age=3600))
+        self.assertEqual(self.store.ingest(ARTICLES), 0)
+        self.assertEqual(len(self.store.get_fresh_articles("tesla", number_articles=2, max_age=3600)), 2)
+        self.assertEqual(len(self.store.search("tesla")), 2)
+
+    def test_recently_fetched_topic_hits_with_fewer_articles(self):
+        self.store.ingest(ARTICLES[:1], topic="Tesla")
+        self.assertEqual(self.store.get_fresh_articles("tesla", number_articles=20), ARTICLES[:1])
+        self.store.ingest(ARTICLES[:1], fetched_at=time.time() - 7200, topic="tesla")
+        self.assertIsNone(self.store.get_fresh_articles("tesla", number_articles=20, max_age=3600))
+
+    def test_purge_removes_stale_articles_from_index(self):
+        self.store.ingest(ARTICLES[:1], fetched_at=time.time() - 7200)
+        self.store.ingest(ARTICLES[1:])
+        self.assertEqual(self.store.purge(max_age=3600), 1)
+        self.assertEqual([a.url for a in self.store.search("tesla")], ["http://link2.com"])
+
+    def test_purge_removes_stale_topics(self):
+        self.store.ingest(ARTICLES, fetched_at=time.time() - 7200, topic="tesla")
+        self.store.purge(max_age=3600)
+        self.assertIsNone(self.store.get_topic_fetched_at("tesla"))
+
+    def test_sent_count_is_kept_for_the_day(self):
+        day = date(2025, 2, 7)
+        self.assertEqual(self.store.get_sent_count("a@gmail.com", day), 0)
+        self.store.record_sent_count("a@gmail.com", day, 120)
+        self.store.record_sent_count("a@gmail.com", day, 180)
+        self.assertEqual(self.store.get_sent_count("a@gmail.com", day), 180)
+        self.store.record_sent_count("a@gmail.com", date(2025, 2, 8), 5)
+        self.assertEqual(self.store.get_sent_count("a@gmail.com", day), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
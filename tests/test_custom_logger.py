@@ -3,15 +3,24 @@
 # =============================================================================
 
 # Python 
+import gzip
 import logging
+import logging.handlers
 import os
+import tempfile
+import time
 import unittest
 
 # Third-party 
 import yaml
 
 # Testing
-from custom_logger import get_custom_logger
+from custom_logger import (
+    BufferedHandler,
+    CompressedRotatingFileHandler,
+    RateLimitFilter,
+    get_custom_logger,
+)
 
 # =============================================================================
 # Tests
@@ -156,6 +165,130 @@ class TestGetCustomLogger(unittest.TestCase):
             )
 
 
+class TestCompressedRotatingFileHandler(unittest.TestCase):
+
+    def test_rotated_files_are_compressed(self):
+        """Test rotated log files are gzipped and the live file stays small"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.log")
+            handler = CompressedRotatingFileHandler(path, maxBytes=100, backupCount=2)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            for i in range(10):
+                handler.emit(logging.makeLogRecord({"msg": f"record {i} " + "x" * 40}))
+            handler.close()
+
+            self.assertTrue(os.path.exists(f"{path}.1.gz"))
+            self.assertTrue(os.path.exists(f"{path}.2.gz"))
+            self.assertFalse(os.path.exists(f"{path}.3.gz"))
+            self.assertFalse(os.path.exists(f"{path}.1"))
+            with gzip.open(f"{path}.1.gz", "rt") as file:
+                self.assertIn("record", file.read())
+
+
+class CountingStream:
+    """File wrapper counting the writes and flushes it receives"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.writes = 0
+        self.flushes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return self.stream.write(text)
+
+    def flush(self):
+        self.flushes += 1
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class TestBufferedHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.target = logging.handlers.BufferingHandler(capacity=1000)
+        self.target.shouldFlush = lambda record: False
+
+    def test_flushes_on_capacity_and_error(self):
+        """Test records are written in batches or as soon as an error arrives"""
+        handler = BufferedHandler(capacity=3, flushLevel="ERROR", target=self.target, flushInterval=60)
+        handler.handle(logging.makeLogRecord({"msg": "a", "levelno": logging.DEBUG}))
+        handler.handle(logging.makeLogRecord({"msg": "b", "levelno": logging.DEBUG}))
+        self.assertEqual(len(self.target.buffer), 0)
+        handler.handle(logging.makeLogRecord({"msg": "c", "levelno": logging.ERROR}))
+        self.assertEqual(len(self.target.buffer), 3)
+        handler.close()
+
+    def test_flushes_on_interval(self):
+        """Test buffered records are written once the flush interval passes"""
+        handler = BufferedHandler(capacity=100, target=self.target, flushInterval=0)
+        handler.handle(logging.makeLogRecord({"msg": "a", "levelno": logging.DEBUG}))
+        self.assertEqual(len(self.target.buffer), 1)
+        handler.close()
+
+    def test_batch_is_one_write_to_file(self):
+        """Test a full buffer reaches a rotating file as one write and one flush"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.log")
+            target = CompressedRotatingFileHandler(path, maxBytes=1 << 20, backupCount=2)
+            target.setFormatter(logging.Formatter("%(message)s"))
+            stream = target.stream = CountingStream(target.stream)
+            handler = BufferedHandler(capacity=256, target=target, flushInterval=60)
+            for i in range(512):
+                handler.handle(logging.makeLogRecord({"msg": f"record {i}", "levelno": logging.DEBUG}))
+            self.assertEqual((stream.writes, stream.flushes), (2, 2))
+            handler.close()
+            target.close()
+
+            with open(path) as file:
+                self.assertEqual(file.read().splitlines(), [f"record {i}" for i in range(512)])
+
+    def test_batch_rolls_over_once(self):
+        """Test a batch past the size limit rotates the file once before it is written"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.log")
+            target = CompressedRotatingFileHandler(path, maxBytes=1000, backupCount=5)
+            target.setFormatter(logging.Formatter("%(message)s"))
+            handler = BufferedHandler(capacity=50, target=target, flushInterval=60)
+            for i in range(100):
+                handler.handle(logging.makeLogRecord({"msg": f"record {i:04d}", "levelno": logging.DEBUG}))
+            handler.close()
+            target.close()
+
+            self.assertTrue(os.path.exists(f"{path}.1.gz"))
+            self.assertFalse(os.path.exists(f"{path}.2.gz"))
+            with open(path) as file:
+                self.assertEqual(file.readline().strip(), "record 0050")
+
+    def test_timer_flushes_idle_buffer(self):
+        """Test records are written after the flush interval even if no record follows"""
+        handler = BufferedHandler(capacity=100, target=self.target, flushInterval=0.05)
+        handler.handle(logging.makeLogRecord({"msg": "a", "levelno": logging.DEBUG}))
+        self.assertEqual(len(self.target.buffer), 0)
+        for _ in range(100):
+            if self.target.buffer:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(self.target.buffer), 1)
+        handler.close()
+
+
+class TestRateLimitFilter(unittest.TestCase):
+
+    def test_drops_records_over_rate(self):
+        """Test records over the byte rate are dropped and counted, errors kept"""
+        rate_limit = RateLimitFilter(rate=1, burst=10)
+        debug = lambda msg: logging.makeLogRecord({"msg": msg, "levelno": logging.DEBUG})
+
+        self.assertTrue(rate_limit.filter(debug("x" * 8)))
+        self.assertFalse(rate_limit.filter(debug("x" * 8)))
+        error = logging.makeLogRecord({"msg": "failed", "levelno": logging.ERROR})
+        self.assertTrue(rate_limit.filter(error))
+        self.assertIn("1 log records dropped", error.getMessage())
+
+
 # =============================================================================
 # Test execution
 # =============================================================================
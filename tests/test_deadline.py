@@ -0,0 +1,113 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+import socket
+import time
+import unittest
+from unittest.mock import patch
+
+# Testing
+from deadline import Deadline, DeadlineExceeded, RunBudget, shutdown_on_expiry
+
+# =============================================================================
+# Tests
+# =============================================================================
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+class TestDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_unlimited_deadline(self):
+        deadline = Deadline(clock=self.clock)
+        self.clock.time = 1e6
+        self.assertIsNone(deadline.remaining())
+        self.assertFalse(deadline.expired)
+        self.assertEqual(deadline.timeout(default=30), 30)
+
+    def test_timeout_capped_by_remaining(self):
+        deadline = Deadline(10, clock=self.clock)
+        self.clock.time = 4
+        self.assertEqual(deadline.timeout(), 6)
+        self.assertEqual(deadline.timeout(default=2), 2)
+
+    def test_timeout_after_expiry_raises(self):
+        deadline = Deadline(10, clock=self.clock)
+        self.clock.time = 10
+        self.assertTrue(deadline.expired)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.timeout()
+
+
+class TestShutdownOnExpiry(unittest.TestCase):
+
+    def test_blocked_read_fails_at_deadline(self):
+        left, right = socket.socketpair()
+        with left, right:
+            start = time.monotonic()
+            with shutdown_on_expiry(left, Deadline(0.1)):
+                self.assertEqual(left.recv(1), b"")
+            self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_connection_left_open_before_deadline(self):
+        left, right = socket.socketpair()
+        with left, right:
+            with shutdown_on_expiry(left, Deadline(0.1)):
+                right.sendall(b"x")
+                self.assertEqual(left.recv(1), b"x")
+            time.sleep(0.2)
+            right.sendall(b"y")
+            self.assertEqual(left.recv(1), b"y")
+
+
+class TestRunBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.patcher_logger = patch("deadline.logger")
+        self.patcher_logger.start()
+
+    def tearDown(self):
+        self.patcher_logger.stop()
+
+    def test_stage_budgets_roll_over(self):
+        budget = RunBudget(100, shares={"fetch": 0.5, "render": 0.1, "send": 0.4}, clock=self.clock)
+        with budget.stage("fetch") as deadline:
+            self.assertEqual(deadline.remaining(), 50)
+            self.clock.time = 10
+        with budget.stage("render") as deadline:
+            self.assertAlmostEqual(deadline.remaining(), 90 * 0.1 / 0.5)
+        with budget.stage("send") as deadline:
+            self.assertAlmostEqual(deadline.remaining(), 90)
+            self.clock.time = 30
+
+        self.assertEqual(budget.timings["fetch"], (50, 10))
+        self.assertIn("send: 20.00s of 90.00s", budget.report())
+        self.assertIn("total: 30.00s of 100.00s", budget.report())
+
+    def test_stage_without_share_gets_remaining_budget(self):
+        budget = RunBudget(100, shares={"fetch": 0.5, "render": 0.1, "send": 0.4}, clock=self.clock)
+        self.clock.time = 10
+        with budget.stage("schedule") as deadline:
+            self.assertEqual(deadline.remaining(), 90)
+            self.assertFalse(deadline.expired)
+
+    def test_unlimited_budget(self):
+        budget = RunBudget(shares={"fetch": 1}, clock=self.clock)
+        with budget.stage("fetch") as deadline:
+            self.assertIsNone(deadline.remaining())
+        self.assertEqual(budget.report(), "fetch: 0.00s, total: 0.00s")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+import smtplib
+import socket
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# Testing
+from deadline import Deadline
+from main import send_messages
+from send_email import format_gmail_message
+
+# =============================================================================
+# Tests
+# =============================================================================
+
+class SilentSMTPServer:
+    """SMTP server that greets each client then never answers again"""
+
+    def __init__(self):
+        self.socket = socket.create_server(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        self.clients = []
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                client, _ = self.socket.accept()
+            except OSError:
+                return
+            client.sendall(b"220 localhost ESMTP\r\n")
+            self.clients.append(client)
+
+    def close(self):
+        self.socket.shutdown(socket.SHUT_RDWR)
+        self.socket.close()
+        for client in self.clients:
+            client.close()
+
+
+class SlowSMTPServer(SilentSMTPServer):
+    """SMTP server answering every command, each after a delay"""
+
+    def __init__(self, delay:float):
+        self.delay = delay
+        super().__init__()
+
+    def serve(self):
+        while True:
+            try:
+                client, _ = self.socket.accept()
+            except OSError:
+                return
+            self.clients.append(client)
+            threading.Thread(target=self.converse, args=(client,), daemon=True).start()
+
+    def converse(self, client):
+        replies = {b"EHLO": b"250-localhost\r\n250 AUTH PLAIN\r\n", b"AUTH": b"235 OK\r\n", b"DATA": b"354 Go ahead\r\n"}
+        try:
+            client.sendall(b"220 localhost ESMTP\r\n")
+            lines = client.makefile("rb")
+            for line in lines:
+                if line[:4].upper() == b"DATA":
+                    time.sleep(self.delay)
+                    client.sendall(replies[b"DATA"])
+                    for data in lines:
+                        if data == b".\r\n":
+                            break
+                time.sleep(self.delay)
+                client.sendall(replies.get(line[:4].upper(), b"250 OK\r\n"))
+        except OSError:
+            pass
+
+
+class TestSendMessages(unittest.TestCase):
+
+    def setUp(self):
+        self.patchers = [patch(f"{module}.logger") for module in ("main", "send_email")]
+        for patcher in self.patchers:
+            patcher.start()
+        self.server = SilentSMTPServer()
+        self.messages = [
+            format_gmail_message("Test", "a@gmail.com", f"receiver{i}@gmail.com", "Message")
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        self.server.close()
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def smtp(self, host, port, context=None, timeout=None):
+        # Plain SMTP to the local server, the session is otherwise the real smtplib one
+        return smtplib.SMTP("127.0.0.1", self.server.port, timeout=timeout)
+
+    def test_hung_session_after_deadline_is_timeout(self):
+        """Test a session hanging until the deadline returns the unsent messages."""
+        with patch("send_email.smtplib.SMTP_SSL", side_effect=self.smtp):
+            failed = send_messages(self.messages, "a@gmail.com", "p", deadline=Deadline(0.5))
+        self.assertEqual(failed, self.messages)
+
+    def test_slow_session_is_cut_at_deadline(self):
+        """Test a server answering each command in time cannot outlast the deadline."""
+        slow = SlowSMTPServer(delay=0.15)
+        smtp = lambda host, port, context=None, timeout=None: smtplib.SMTP("127.0.0.1", slow.port, timeout=timeout)
+        try:
+            start = time.monotonic()
+            with patch("send_email.smtplib.SMTP_SSL", side_effect=smtp):
+                failed = send_messages(self.messages, "a@gmail.com", "p", deadline=Deadline(0.5))
+            elapsed = time.monotonic() - start
+        finally:
+            slow.close()
+        self.assertEqual(failed, self.messages)
+        self.assertLess(elapsed, 1.0)
+
+    def test_connection_error_before_deadline_raises(self):
+        """Test a connection error unrelated to the deadline is raised."""
+        with socket.create_server(("127.0.0.1", 0)) as closed:
+            port = closed.getsockname()[1]
+        refused = lambda host, _, context=None, timeout=None: smtplib.SMTP(host, port, timeout=timeout)
+        with patch("send_email.smtplib.SMTP_SSL", side_effect=refused):
+            with self.assertRaises(OSError):
+                send_messages(self.messages, "a@gmail.com", "p", deadline=Deadline(60))
+
+
+if __name__ == "__main__":
+    unittest.main()
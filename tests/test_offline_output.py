@@ -0,0 +1,87 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+from email import message_from_bytes
+from email.message import EmailMessage
+import mailbox
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Testing
+from offline_output import open_writer, serialize_message, write_messages
+
+# =============================================================================
+# Tests
+# =============================================================================
+
+def make_messages(number:int) -> list:
+    messages = []
+    for i in range(number):
+        msg = EmailMessage()
+        msg["Subject"] = f"Subject {i}"
+        msg["From"] = "sender@gmail.com"
+        msg["To"] = f"receiver{i}@gmail.com"
+        msg.set_content("From the news today\nMessage body")
+        messages.append(msg)
+    return messages
+
+
+class BaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.patcher_logger = patch("offline_output.logger")
+        self.mock_logger = self.patcher_logger.start()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        self.patcher_logger.stop()
+
+
+class TestWriteMessages(BaseTestCase):
+    def test_eml(self):
+        path = os.path.join(self.directory.name, "eml")
+        writer = open_writer(path, "eml")
+        self.assertEqual(write_messages(make_messages(20), writer, workers=3), 20)
+        writer.close()
+
+        files = os.listdir(path)
+        self.assertEqual(len(files), 20)
+        self.assertTrue(all(name.endswith(".eml") for name in files))
+        with open(os.path.join(path, files[0]), "rb") as file:
+            self.assertIn("Subject", message_from_bytes(file.read()))
+
+    def test_maildir(self):
+        path = os.path.join(self.directory.name, "Maildir")
+        writer = open_writer(path, "maildir")
+        write_messages(make_messages(5), writer)
+        writer.close()
+
+        self.assertEqual(os.listdir(os.path.join(path, "tmp")), [])
+        subjects = sorted(message["Subject"] for message in mailbox.Maildir(path, create=False))
+        self.assertEqual(subjects, [f"Subject {i}" for i in range(5)])
+
+    def test_mbox(self):
+        path = os.path.join(self.directory.name, "digest.mbox")
+        writer = open_writer(path, "mbox")
+        write_messages(iter(make_messages(5)), writer, workers=2)
+        writer.close()
+
+        messages = list(mailbox.mbox(path))
+        self.assertEqual(len(messages), 5)
+        self.assertIn(">From the news today", messages[0].get_payload())
+
+    def test_serialize_message(self):
+        message = make_messages(1)[0]
+        self.assertEqual(message_from_bytes(serialize_message(message))["To"], "receiver0@gmail.com")
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            open_writer(self.directory.name, "pst")
+
+
+if __name__ == "__main__":
+    unittest.main()
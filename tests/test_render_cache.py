@@ -0,0 +1,76 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+import unittest
+from unittest.mock import patch
+
+# Testing
+from render_cache import RenderCache, get_digest_key
+from send_email import format_gmail_message
+from utils import Article
+
+# =============================================================================
+# Tests
+# =============================================================================
+
+ARTICLES = [
+    Article("Title 1", "Desc 1", "http://link1.com"),
+    Article("Titre 2", "Déscription 2", "http://link2.com"),
+]
+
+
+class BaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.patcher_logger = patch("render_cache.logger")
+        self.mock_logger = self.patcher_logger.start()
+
+    def tearDown(self):
+        self.patcher_logger.stop()
+
+
+class TestGetDigestKey(unittest.TestCase):
+    def test_same_digest_same_key(self):
+        copy = [Article(a.title, a.description, a.url, "2025-02-07") for a in ARTICLES]
+        self.assertEqual(get_digest_key("Hi\n", ARTICLES), get_digest_key("Hi\n", copy))
+
+    def test_template_and_order_change_key(self):
+        self.assertNotEqual(get_digest_key("Hi\n", ARTICLES), get_digest_key("Hello\n", ARTICLES))
+        self.assertNotEqual(get_digest_key("Hi\n", ARTICLES), get_digest_key("Hi\n", ARTICLES[::-1]))
+
+
+class TestRenderCache(BaseTestCase):
+    @patch("render_cache.encode_gmail_body", wraps=__import__("render_cache").encode_gmail_body)
+    def test_body_rendered_once_per_digest(self, mock_encode):
+        cache = RenderCache()
+        messages = [
+            cache.format_message("Subject", "sender@gmail.com", f"receiver{i}@gmail.com", "Hi\n", ARTICLES)
+            for i in range(5)
+        ]
+        self.assertEqual(mock_encode.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses), (4, 1))
+        self.assertEqual([m["To"] for m in messages], [f"receiver{i}@gmail.com" for i in range(5)])
+
+    def test_message_matches_uncached(self):
+        cache = RenderCache()
+        cached = cache.format_message("Subject", "sender@gmail.com", "receiver@gmail.com", "Hi\n", ARTICLES)
+        expected = format_gmail_message(
+            "Subject", "sender@gmail.com", "receiver@gmail.com",
+            "Hi\n[1]\nTitle: Title 1\nDescription: Desc 1\nLink: http://link1.com\n\n"
+            "[2]\nTitle: Titre 2\nDescription: Déscription 2\nLink: http://link2.com",
+        )
+        self.assertEqual(sorted(cached.items()), sorted(expected.items()))
+        self.assertEqual(cached.get_content(), expected.get_content())
+        self.assertIn("Déscription 2".encode(), cached.as_bytes())
+
+    def test_least_recently_used_evicted(self):
+        cache = RenderCache(max_entries=1)
+        cache.get_body("A", ARTICLES)
+        cache.get_body("B", ARTICLES)
+        cache.get_body("A", ARTICLES)
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+# =============================================================================
+# Modules
+# =============================================================================
+
+# Python
+from datetime import datetime, timedelta, timezone
+import os
+import unittest
+from unittest.mock import patch
+
+# Third-party
+import yaml
+
+# Testing
+from deadline import Deadline, DeadlineExceeded, RunBudget
+from scheduler import Recipient, Slot, assign_slots, get_preferred_time, load_recipients, run_schedule
+
+# =============================================================================
+# Tests
+# =============================================================================
+
+NOW = datetime(2025, 2, 7, tzinfo=timezone.utc)
+
+
+class BaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.patcher_logger = patch("scheduler.logger")
+        self.mock_logger = self.patcher_logger.start()
+
+    def tearDown(self):
+        self.patcher_logger.stop()
+
+
+class TestLoadRecipients(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_yaml_file = "test_recipients.yaml"
+
+    def tearDown(self):
+        if os.path.exists(self.test_yaml_file):
+            os.remove(self.test_yaml_file)
+        super().tearDown()
+
+    def write(self, recipients):
+        with open(self.test_yaml_file, "w") as file:
+            yaml.dump({"recipients": recipients}, file)
+
+    def test_load_recipients(self):
+        self.write([{"email": "a@gmail.com", "topic": "climate", "timezone": "Europe/London", "hour": 7}, {"email": "b@gmail.com"}])
+        result = load_recipients(self.test_yaml_file)
+        self.assertEqual(result, [Recipient("a@gmail.com", "climate", "Europe/London", 7), Recipient("b@gmail.com")])
+
+    def test_load_recipients_unknown_timezone(self):
+        self.write([{"email": "a@gmail.com", "timezone": "Mars/Olympus"}])
+        with self.assertRaises(ValueError):
+            load_recipients(self.test_yaml_file)
+
+
+class TestAssignSlots(BaseTestCase):
+    def test_preferred_time_in_utc(self):
+        recipient = Recipient("a@gmail.com", timezone="America/New_York", hour=7)
+        self.assertEqual(get_preferred_time(recipient, NOW), datetime(2025, 2, 7, 12, tzinfo=timezone.utc))
+
+    def test_preferred_time_already_passed_rolls_to_next_day(self):
+        recipient = Recipient("a@gmail.com", timezone="Pacific/Auckland", hour=7)
+        now = datetime(2025, 2, 6, 20, tzinfo=timezone.utc)
+        self.assertEqual(get_preferred_time(recipient, now), datetime(2025, 2, 7, 18, tzinfo=timezone.utc))
+
+    def test_slots_never_start_in_the_past(self):
+        recipients = [Recipient("a@gmail.com", timezone="Pacific/Auckland", hour=7), Recipient("b@gmail.com", hour=8)]
+        now = datetime(2025, 2, 7, 6, tzinfo=timezone.utc)
+        slots = assign_slots(recipients, now, window_minutes=5, slot_minutes=5)
+        self.assertEqual([slot.start for slot in slots], [datetime(2025, 2, 7, 8, tzinfo=timezone.utc), datetime(2025, 2, 7, 18, tzinfo=timezone.utc)])
+
+    def test_spread_evenly_over_window(self):
+        recipients = [Recipient(f"{i}@gmail.com", hour=8) for i in range(24)]
+        slots = assign_slots(recipients, NOW, window_minutes=60, slot_minutes=5)
+        self.assertEqual(len(slots), 12)
+        self.assertTrue(all(len(slot.recipients) == 2 for slot in slots))
+        self.assertEqual(slots[0].start, datetime(2025, 2, 7, 8, tzinfo=timezone.utc))
+        self.assertEqual(slots[-1].start, datetime(2025, 2, 7, 8, 55, tzinfo=timezone.utc))
+
+    def test_slots_group_topics(self):
+        recipients = [Recipient(f"{i}@gmail.com", topic=("a" if i % 2 else "b")) for i in range(4)]
+        slots = assign_slots(recipients, NOW, window_minutes=10, slot_minutes=5)
+        self.assertEqual([slot.topics for slot in slots], [["a"], ["b"]])
+
+    def test_overflow_carried_to_next_slot(self):
+        recipients = [Recipient(f"{i}@gmail.com", hour=8) for i in range(5)]
+        slots = assign_slots(recipients, NOW, window_minutes=5, slot_minutes=5, max_per_slot=2)
+        self.assertEqual([len(slot.recipients) for slot in slots], [2, 2, 1])
+        self.assertEqual(slots[2].start - slots[0].start, timedelta(minutes=10))
+
+    def test_carry_never_moves_slots_earlier(self):
+        recipients = [Recipient(f"{i}@gmail.com", hour=8) for i in range(3)] + [Recipient("k@gmail.com", timezone="Asia/Kolkata", hour=14)]
+        slots = assign_slots(recipients, NOW, window_minutes=20, slot_minutes=20, max_per_slot=1)
+        starts = [slot.start for slot in slots]
+        self.assertEqual(starts, [datetime(2025, 2, 7, 8, tzinfo=timezone.utc) + timedelta(minutes=20 * i) for i in range(4)])
+
+
+class TestRunSchedule(BaseTestCase):
+    def test_fetch_ahead_then_send(self):
+        start = datetime(2025, 2, 7, 8, tzinfo=timezone.utc)
+        slots = [Slot(start, (Recipient("a@gmail.com", "x"), Recipient("b@gmail.com", "x")))]
+        clock = [start - timedelta(hours=1)]
+        events = []
+
+        def sleep(seconds):
+            clock[0] += timedelta(seconds=seconds)
+
+        def fetch(topic):
+            events.append(("fetch", topic, clock[0]))
+            return [topic]
+
+        def send(slot, articles):
+            events.append(("send", articles, clock[0]))
+
+        run_schedule(slots, fetch, send, lead=timedelta(minutes=5), now=lambda: clock[0], sleep=sleep)
+        self.assertEqual(events, [
+            ("fetch", "x", start - timedelta(minutes=5)),
+            ("send", {"x": ["x"]}, start),
+        ])
+
+    def test_failures_do_not_stop_schedule(self):
+        start = datetime(2025, 2, 7, 8, tzinfo=timezone.utc)
+        slots = [
+            Slot(start, (Recipient("a@gmail.com", "x"), Recipient("b@gmail.com", "y"))),
+            Slot(start + timedelta(minutes=5), (Recipient("c@gmail.com", "x"),)),
+        ]
+        clock = [start]
+        sent = []
+
+        def sleep(seconds):
+            clock[0] += timedelta(seconds=seconds)
+
+        def fetch(topic):
+            if topic == "y":
+                raise RuntimeError("429 Too Many Requests")
+            return [topic]
+
+        def send(slot, articles):
+            sent.append(articles)
+            if len(sent) == 1:
+                raise RuntimeError("SMTP error")
+
+        run_schedule(slots, fetch, send, now=lambda: clock[0], sleep=sleep)
+        self.assertEqual(sent, [{"x": ["x"], "y": []}, {"x": ["x"]}])
+        self.assertEqual(self.mock_logger.error.call_count, 2)
+
+    def test_deadline_stops_schedule(self):
+        start = datetime(2025, 2, 7, 8, tzinfo=timezone.utc)
+        slots = [Slot(start, (Recipient("a@gmail.com"),)), Slot(start + timedelta(hours=1), (Recipient("b@gmail.com"),))]
+        clock = [start]
+        sent = []
+
+        def sleep(seconds):
+            clock[0] += timedelta(seconds=seconds)
+
+        deadline = Deadline(600, clock=lambda: (clock[0] - start).total_seconds())
+        with self.assertRaises(DeadlineExceeded):
+            run_schedule(slots, lambda topic: [], lambda slot, articles: sent.append(slot), now=lambda: clock[0], sleep=sleep, deadline=deadline)
+        self.assertEqual(sent, slots[:1])
+        self.assertEqual(clock[0], start + timedelta(minutes=10))
+
+    def test_schedule_stage_of_run_budget(self):
+        start = datetime(2025, 2, 7, 8, tzinfo=timezone.utc)
+        slots = [Slot(start, (Recipient("a@gmail.com"),)), Slot(start + timedelta(minutes=5), (Recipient("b@gmail.com"),))]
+        clock = [start]
+        sent = []
+
+        def sleep(seconds):
+            clock[0] += timedelta(seconds=seconds)
+
+        budget = RunBudget(3600, shares={"fetch": 0.5, "render": 0.1, "send": 0.4}, clock=lambda: (clock[0] - start).total_seconds())
+        with patch("deadline.logger"), budget.stage("schedule") as deadline:
+            run_schedule(slots, lambda topic: [], lambda slot, articles: sent.append(slot), now=lambda: clock[0], sleep=sleep, deadline=deadline)
+            self.assertFalse(deadline.expired)
+        self.assertEqual(sent, slots)
+
+
+if __name__ == "__main__":
+    unittest.main()
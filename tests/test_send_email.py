@@ -3,9 +3,13 @@
 # =============================================================================
 
 # Python
+from email import message_from_bytes, policy
+from email.generator import BytesGenerator
 from email.message import EmailMessage
 import smtplib
 import ssl
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 
@@ -13,7 +17,19 @@ from unittest.mock import patch, MagicMock
 import yaml
 
 # Testing
-from send_email import format_gmail_message, send_gmail_from_ppw
+from deadline import Deadline
+from send_email import (
+    SenderAccount,
+    SenderPool,
+    encode_gmail_body,
+    format_gmail_message,
+    format_gmail_message_from_body,
+    is_daily_limit_error,
+    is_session_limit_error,
+    parse_sender_accounts,
+    send_gmail_from_ppw,
+    send_smtp_message,
+)
 
 # =============================================================================
 # Tests
@@ -46,6 +62,51 @@ class TestFormatGmailMessage(unittest.TestCase):
         with self.assertRaises(AssertionError):
             format_gmail_message("Test", "sender@gmail.com", "invalid_email", "Message")
 
+class TestFormatGmailMessageFromBody(unittest.TestCase):
+
+    def test_body_flattened_once_for_all_messages(self):
+        """Test messages share one flattened body and serialize like a plain message."""
+        body = encode_gmail_body("This is a test email.")
+        messages = [
+            format_gmail_message_from_body("Test", "sender@gmail.com", f"receiver{i}@gmail.com", body)
+            for i in range(5)
+        ]
+        with patch("send_email.BytesGenerator", wraps=BytesGenerator) as mock_generator:
+            data = [message.as_bytes() for message in messages]
+            data += [message.as_bytes() for message in messages]
+        self.assertEqual(mock_generator.call_count, 1)
+
+        expected = format_gmail_message("Test", "sender@gmail.com", "receiver4@gmail.com", "This is a test email.")
+        parsed = message_from_bytes(data[4], policy=policy.default)
+        self.assertEqual(sorted(parsed.items()), sorted(expected.items()))
+        self.assertEqual(parsed.get_content(), expected.get_content())
+        self.assertIsNone(body.message["To"])
+
+    def test_replaced_header_is_serialized(self):
+        """Test a header replaced after building, as the sender pool does with From, is sent."""
+        message = format_gmail_message_from_body("Test", "sender@gmail.com", "receiver@gmail.com", encode_gmail_body("Message"))
+        del message["From"]
+        message["From"] = "other@gmail.com"
+        parsed = message_from_bytes(message.as_bytes(), policy=policy.default)
+        self.assertEqual(parsed.get_all("From"), ["other@gmail.com"])
+
+    def test_send_smtp_message_sends_shared_bytes(self):
+        """Test a shared body message is sent as CRLF bytes without flattening it again."""
+        message = format_gmail_message_from_body("Test", "sender@gmail.com", "receiver@gmail.com", encode_gmail_body("Line 1\nLine 2"))
+        server = MagicMock()
+        send_smtp_message(server, message)
+
+        server.send_message.assert_not_called()
+        from_addr, to_addrs, data = server.sendmail.call_args.args
+        self.assertEqual((from_addr, to_addrs), ("sender@gmail.com", ["receiver@gmail.com"]))
+        self.assertIn(b"Line 1\r\nLine 2", data)
+        self.assertNotIn(b"\n", data.replace(b"\r\n", b""))
+
+    def test_invalid_receiver_email(self):
+        """Test invalid receiver email raises an assertion error."""
+        with self.assertRaises(AssertionError):
+            format_gmail_message_from_body("Test", "sender@gmail.com", "invalid_email", encode_gmail_body("Message"))
+
 class TestSendGmailFromPPW(unittest.TestCase):
 
     @patch("send_email.smtplib.SMTP_SSL")
@@ -70,6 +131,18 @@ class TestSendGmailFromPPW(unittest.TestCase):
         mock_server.login.assert_called_once_with(username, password)
         mock_server.send_message.assert_called_once_with(message)
 
+    @patch("send_email.smtplib.SMTP_SSL")
+    @patch("send_email.ssl.create_default_context")
+    def test_send_email_timeout(self, mock_ssl_context, mock_smtp):
+        """Test the timeout bounds the SMTP session and a timeout is re-raised."""
+        mock_smtp.side_effect = TimeoutError("The handshake operation timed out")
+        username = "valid_sender@gmail.com"
+        message = format_gmail_message("Test Subject", username, "valid_receiver@gmail.com", "Message")
+
+        with self.assertRaises(TimeoutError):
+            send_gmail_from_ppw(username, "password", message, timeout=5)
+        mock_smtp.assert_called_once_with("smtp.gmail.com", 465, context=mock_ssl_context.return_value, timeout=5)
+
     def test_invalid_email_raises_assertion(self):
         """Test sending email with invalid username raises an assertion error."""
         with self.assertRaises(AssertionError):
@@ -119,5 +192,149 @@ class TestSendGmailFromPPW(unittest.TestCase):
         with self.assertRaises(smtplib.SMTPException):
             send_gmail_from_ppw(username, password, message)
 
+class TestParseSenderAccounts(unittest.TestCase):
+
+    def test_parse_accounts(self):
+        """Test parsing comma separated username:password pairs."""
+        accounts = parse_sender_accounts("a@gmail.com:pass1, b@gmail.com:pass:2", daily_quota=10)
+        self.assertEqual([a.username for a in accounts], ["a@gmail.com", "b@gmail.com"])
+        self.assertEqual(accounts[1].password, "pass:2")
+        self.assertEqual(accounts[0].remaining_quota, 10)
+
+    def test_parse_invalid_account(self):
+        """Test a pair without password raises a value error."""
+        with self.assertRaises(ValueError):
+            parse_sender_accounts("a@gmail.com")
+
+    def test_is_daily_limit_error(self):
+        """Test only the Gmail daily sending limit response is a daily limit."""
+        self.assertTrue(is_daily_limit_error(smtplib.SMTPDataError(550, b"5.4.5 Daily user sending limit exceeded")))
+        self.assertFalse(is_daily_limit_error(smtplib.SMTPSenderRefused(421, b"Try again later", "a@gmail.com")))
+        self.assertFalse(is_daily_limit_error(smtplib.SMTPDataError(554, b"Message rejected")))
+
+    def test_is_session_limit_error(self):
+        """Test temporary Gmail session limit responses are recognised."""
+        self.assertTrue(is_session_limit_error(smtplib.SMTPSenderRefused(421, b"Try again later", "a@gmail.com")))
+        self.assertTrue(is_session_limit_error(smtplib.SMTPDataError(454, b"Temporary service limit")))
+        self.assertFalse(is_session_limit_error(smtplib.SMTPDataError(550, b"5.4.5 Daily user sending limit exceeded")))
+
+class TestSenderPool(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = [
+            format_gmail_message("Test", "a@gmail.com", f"receiver{i}@gmail.com", "Message")
+            for i in range(6)
+        ]
+
+    @patch("send_email.smtplib.SMTP_SSL")
+    @patch("send_email.ssl.create_default_context")
+    def test_send_spreads_across_accounts(self, mock_ssl_context, mock_smtp):
+        """Test messages are spread across accounts within their quotas."""
+        accounts = [SenderAccount("a@gmail.com", "p", daily_quota=3), SenderAccount("b@gmail.com", "p", daily_quota=3)]
+        failed = SenderPool(accounts).send(self.messages)
+
+        self.assertEqual(failed, [])
+        self.assertEqual([a.sent_today for a in accounts], [3, 3])
+        self.assertEqual(mock_smtp.return_value.send_message.call_count, 6)
+
+    @patch("send_email.smtplib.SMTP_SSL")
+    @patch("send_email.ssl.create_default_context")
+    def test_send_moves_work_on_auth_error(self, mock_ssl_context, mock_smtp):
+        """Test an account failing authentication hands its work to the others."""
+        def login(username, password):
+            if username == "a@gmail.com":
+                raise smtplib.SMTPAuthenticationError(535, "Authentication failed")
+        mock_smtp.return_value.login.side_effect = login
+        accounts = [SenderAccount("a@gmail.com", "p"), SenderAccount("b@gmail.com", "p")]
+        failed = SenderPool(accounts).send(self.messages)
+
+        self.assertEqual(failed, [])
+        self.assertTrue(accounts[0].disabled)
+        self.assertEqual(accounts[1].sent_today, 6)
+        self.assertTrue(all(m["From"] == "b@gmail.com" for m in self.messages))
+
+    @patch("send_email.smtplib.SMTP_SSL")
+    @patch("send_email.ssl.create_default_context")
+    def test_send_returns_unsent_when_quota_exhausted(self, mock_ssl_context, mock_smtp):
+        """Test messages beyond the pool quota are returned unsent."""
+        accounts = [SenderAccount("a@gmail.com", "p", daily_quota=2), SenderAccount("b@gmail.com", "p", daily_quota=2)]
+        failed = SenderPool(accounts).send(self.messages)
+
+        self.assertEqual(len(failed), 2)
+        self.assertEqual(SenderPool(accounts).remaining_quota, 0)
+
+    @patch("send_email.time.sleep")
+    @patch("send_email.smtplib.SMTP_SSL")
+    @patch("send_email.ssl.create_default_context")
+    def test_send_backs_off_on_session_limit(self, mock_ssl_context, mock_smtp, mock_sleep):
+        """Test a temporary session limit closes the session and retries without exhausting the account."""
+        responses = [smtplib.SMTPSenderRefused(421, b"Try again later", "a@gmail.com")]
+        def send_message(message):
+            if responses:
+                raise responses.pop()
+        mock_smtp.return_value.send_message.side_effect = send_message
+        account = SenderAccount("a@gmail.com", "p", max_sessions=1)
+        failed = SenderPool([account], session_backoff=5).send(self.messages)
+
+        self.assertEqual(failed, [])
+        self.assertFalse(account.disabled)
+        self.assertEqual(account.sent_today, 6)
+        self.assertEqual(mock_smtp.call_count, 2)
+        mock_sleep.assert_called_once_with(5)
+
+    @patch("send_email.smtplib.SMTP_SSL")
+    @patch("send_email.ssl.create_default_context")
+    def test_send_reconnects_when_disconnected(self, mock_ssl_context, mock_smtp):
+        """Test a session dropped by the server reconnects and keeps sending."""
+        responses = [smtplib.SMTPServerDisconnected("Connection unexpectedly closed")] * 2
+        def send_message(message):
+            if responses:
+                raise responses.pop()
+        mock_smtp.return_value.send_message.side_effect = send_message
+        account = SenderAccount("a@gmail.com", "p", max_sessions=1)
+        failed = SenderPool([account]).send(self.messages)
+
+        self.assertEqual(failed, [])
+        self.assertEqual(account.sent_today, 6)
+        self.assertEqual(mock_smtp.call_count, 3)
+
+    @patch("send_email.smtplib.SMTP_SSL")
+    @patch("send_email.ssl.create_default_context")
+    def test_send_exhausts_account_on_daily_limit(self, mock_ssl_context, mock_smtp):
+        """Test the daily sending limit takes the account out for the day."""
+        mock_smtp.return_value.send_message.side_effect = smtplib.SMTPDataError(550, b"5.4.5 Daily user sending limit exceeded")
+        account = SenderAccount("a@gmail.com", "p", max_sessions=1)
+        failed = SenderPool([account]).send(self.messages)
+
+        self.assertEqual(len(failed), 6)
+        self.assertEqual(account.remaining_quota, 0)
+
+    @patch("send_email.smtplib.SMTP_SSL")
+    @patch("send_email.ssl.create_default_context")
+    def test_send_reports_in_flight_messages_after_deadline(self, mock_ssl_context, mock_smtp):
+        """Test a message still being sent when the pool stops waiting is reported unsent."""
+        release = threading.Event()
+        mock_smtp.return_value.send_message.side_effect = lambda message: release.wait(5)
+        account = SenderAccount("a@gmail.com", "p", max_sessions=1)
+        failed = SenderPool([account]).send(self.messages[:2], deadline=Deadline(0.1))
+        release.set()
+
+        self.assertEqual(failed, self.messages[:2])
+
+    @patch("send_email.smtplib.SMTP_SSL")
+    @patch("send_email.ssl.create_default_context")
+    def test_send_waits_for_hung_sessions_once(self, mock_ssl_context, mock_smtp):
+        """Test hung sessions share one grace period instead of one each."""
+        release = threading.Event()
+        mock_smtp.return_value.send_message.side_effect = lambda message: release.wait(10)
+        accounts = [SenderAccount(f"{name}@gmail.com", "p", max_sessions=1) for name in "abcd"]
+        start = time.monotonic()
+        failed = SenderPool(accounts).send(self.messages[:4], deadline=Deadline(0.1))
+        elapsed = time.monotonic() - start
+        release.set()
+
+        self.assertEqual(len(failed), 4)
+        self.assertLess(elapsed, 2.0)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -3,15 +3,25 @@
 # =============================================================================
 
 # Python modules
+import gzip
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+import json
 import os
+import threading
+import time
 import requests
 import unittest
 from unittest.mock import patch, MagicMock
+from deadline import Deadline, DeadlineExceeded
 from utils import (
+    Article,
+    TransferStats,
     get_env_var,
     get_news_api_endpoint,
     get_http_response,
     get_article_title_description_link,
+    iter_articles,
+    render_articles,
 )
 
 # =============================================================================
@@ -57,7 +67,8 @@ class TestGetHttpResponse(BaseTestCase):
     def test_get_http_response_success(self, mock_requests_get):
         mock_response = MagicMock()
         mock_response.raise_for_status.return_value = None
-        mock_response.json.return_value = {"status": "ok"}
+        mock_response.headers = {}
+        mock_response.raw.stream.return_value = [b'{"status": ', b'"ok"}']
         mock_requests_get.return_value = mock_response
 
         url = "http://example.com"
@@ -67,6 +78,16 @@ class TestGetHttpResponse(BaseTestCase):
         self.assertEqual(result, {"status": "ok"})
         self.mock_logger.info.assert_called()
 
+    @patch("utils.requests.get")
+    def test_get_http_response_releases_connection_on_error(self, mock_requests_get):
+        mock_response = MagicMock()
+        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("429 Client Error")
+        mock_requests_get.return_value = mock_response
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            get_http_response("http://example.com", {"User-Agent": "test-agent"})
+        mock_response.close.assert_called_once()
+
     @patch("utils.requests.get", side_effect=requests.exceptions.RequestException("Request failed"))
     def test_get_http_response_request_exception(self, mock_requests_get):
         url = "http://example.com"
@@ -75,6 +96,77 @@ class TestGetHttpResponse(BaseTestCase):
             get_http_response(url, headers)
         self.mock_logger.error.assert_called()
 
+    def test_get_http_response_records_transfer_stats(self):
+        body = json.dumps({"articles": [{"title": "T" * 1000}]}).encode()
+        compressed = gzip.compress(body)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Encoding", "gzip")
+                if self.path == "/chunked":
+                    # No Content-Length, urllib3 does not count these bytes itself
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for start in range(0, len(compressed), 10):
+                        chunk = compressed[start:start + 10]
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    self.send_header("Content-Length", str(len(compressed)))
+                    self.end_headers()
+                    self.wfile.write(compressed)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for path in ("/", "/chunked"):
+                with self.subTest(path=path):
+                    stats = TransferStats()
+                    result = get_http_response(f"http://127.0.0.1:{server.server_address[1]}{path}", stats=stats)
+                    self.assertEqual(result, {"articles": [{"title": "T" * 1000}]})
+                    self.assertEqual(
+                        (stats.fetches, stats.compressed_bytes, stats.decompressed_bytes),
+                        (1, len(compressed), len(body)),
+                    )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_get_http_response_stops_trickling_body_at_deadline(self):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "100000")
+                self.end_headers()
+                try:
+                    for _ in range(1000):
+                        self.wfile.write(b" ")
+                        self.wfile.flush()
+                        time.sleep(0.02)
+                except OSError:
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            start = time.monotonic()
+            with self.assertRaises(DeadlineExceeded):
+                get_http_response(f"http://127.0.0.1:{server.server_address[1]}", deadline=Deadline(0.5))
+            self.assertLess(time.monotonic() - start, 2)
+        finally:
+            server.shutdown()
+            server.server_close()
+
 
 class TestGetArticleTitleDescriptionLink(BaseTestCase):
     def test_get_article_title_description_link_success(self):
@@ -96,5 +188,40 @@ class TestGetArticleTitleDescriptionLink(BaseTestCase):
         self.mock_logger.error.assert_called()
 
 
+class TestIterArticles(BaseTestCase):
+    def test_iter_articles_projects_and_skips_empty(self):
+        content = {
+            "articles": [
+                {"title": None, "description": None, "url": None},
+                {"title": "Title 1", "description": "Desc 1", "url": "http://link1.com", "author": "A", "publishedAt": "2025-02-07T10:00:00Z"},
+            ]
+        }
+        result = list(iter_articles(content))
+        self.assertEqual(result, [Article("Title 1", "Desc 1", "http://link1.com", "2025-02-07T10:00:00Z")])
+
+    def test_iter_articles_is_lazy(self):
+        content = {"articles": [{"title": "Title 1", "description": "Desc 1", "url": "http://link1.com"}, "invalid"]}
+        articles = iter_articles(content)
+        self.assertEqual(next(articles).title, "Title 1")
+        with self.assertRaises(TypeError):
+            next(articles)
+
+    def test_article_is_immutable(self):
+        article = Article("Title 1", "Desc 1", "http://link1.com")
+        with self.assertRaises(AttributeError):
+            article.title = "Title 2"
+        self.assertFalse(hasattr(article, "__dict__"))
+
+
+class TestRenderArticles(BaseTestCase):
+    def test_render_articles_limits_number(self):
+        articles = (Article(f"Title {i}", f"Desc {i}", f"http://link{i}.com") for i in range(1, 4))
+        result = list(render_articles(articles, number_articles=2))
+        self.assertEqual(result, [
+            "[1]\nTitle: Title 1\nDescription: Desc 1\nLink: http://link1.com",
+            "[2]\nTitle: Title 2\nDescription: Desc 2\nLink: http://link2.com",
+        ])
+
+
 if __name__ == "__main__":
     unittest.main()